@@ -0,0 +1,544 @@
+import speech_recognition as sr
+import numpy as np
+import json
+import math
+import os
+import tempfile
+import threading
+import queue
+import time
+from collections import deque
+
+
+DEFAULT_NOISE_PATH = os.path.join(os.path.expanduser("~"), ".niley", "noise.json")
+
+
+class AudioCapture:
+    """Always-on microphone capture: one open stream, phrases pushed to a bounded queue"""
+
+    def __init__(self, recognizer, microphone, phrase_time_limit=8, max_phrases=8,
+                 max_age=15, is_muted=None, noise_tracker=None, barge_in=None, barge_in_preroll=0.3):
+        self.recognizer = recognizer
+        self.microphone = microphone
+        # Follows the noise floor on every buffer read and sets recognizer.energy_threshold
+        self.noise_tracker = noise_tracker
+        # Watches every buffer for the user talking over playback (BargeInDetector)
+        self.barge_in = barge_in
+        # Audio kept from before a barge-in onset, so the first syllable isn't clipped
+        self.barge_in_preroll = barge_in_preroll
+        self.phrase_time_limit = phrase_time_limit
+        # Phrases older than this (seconds) are stale and skipped
+        self.max_age = max_age
+        # is_muted(start, end) -> True drops the phrase (e.g. it overlaps our own speech)
+        self.is_muted = is_muted
+
+        self.phrases = queue.Queue(maxsize=max_phrases)
+        self.captured = 0
+        self.dropped = 0
+        self.muted = 0
+
+        self._source = None
+        self._thread = None
+        self._running = threading.Event()
+
+    @property
+    def running(self):
+        return self._running.is_set()
+
+    def start(self, calibrate_duration=1):
+        """Open the microphone once and start the capture thread"""
+        if self.running:
+            return
+        self._source = self.microphone.__enter__()
+        try:
+            if self.noise_tracker:
+                self.noise_tracker.attach(self._source)
+            if self.barge_in:
+                self.barge_in.attach(self._source)
+            if calibrate_duration:
+                self.recognizer.adjust_for_ambient_noise(self._source, duration=calibrate_duration)
+        except Exception:
+            self.microphone.__exit__(None, None, None)
+            self._source = None
+            raise
+
+        self._running.set()
+        self._thread = threading.Thread(target=self._run, name="audio-capture", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop capturing and close the microphone"""
+        if not self.running:
+            return
+        self._running.clear()
+        if self._thread:
+            self._thread.join(timeout=self.phrase_time_limit + 2)
+        try:
+            self.microphone.__exit__(None, None, None)
+        except Exception:
+            pass
+        self._source = None
+
+    def _run(self):
+        while self._running.is_set():
+            try:
+                # Short timeout so stop() is noticed quickly; the stream stays open between calls
+                audio = self.recognizer.listen(
+                    self._source,
+                    timeout=1,
+                    phrase_time_limit=self.phrase_time_limit
+                )
+            except sr.WaitTimeoutError:
+                continue
+            except Exception as e:
+                print(f"⚠️  Capture error: {e}")
+                time.sleep(0.5)
+                continue
+
+            ended_at = time.monotonic()
+            duration = len(audio.frame_data) / float(audio.sample_rate * audio.sample_width)
+            started_at = ended_at - duration
+
+            onset = self.barge_in.onset_within(started_at, ended_at) if self.barge_in else None
+            if onset is not None:
+                # The user talked over us: keep what they said, not the echo before it
+                audio, started_at = self._trim(audio, started_at, onset - self.barge_in_preroll)
+            elif self.is_muted and self.is_muted(started_at, ended_at):
+                self.muted += 1
+                continue
+
+            self._push((started_at, ended_at, audio))
+
+    @staticmethod
+    def _trim(audio, started_at, new_start):
+        """Drop the audio before new_start (a monotonic time); returns (audio, started_at)"""
+        if new_start <= started_at:
+            return audio, started_at
+        frame_bytes = audio.sample_width
+        offset = int((new_start - started_at) * audio.sample_rate) * frame_bytes
+        offset = min(offset, len(audio.frame_data) - frame_bytes)
+        trimmed = sr.AudioData(audio.frame_data[offset:], audio.sample_rate, audio.sample_width)
+        return trimmed, started_at + offset / float(audio.sample_rate * frame_bytes)
+
+    def _push(self, item):
+        self.captured += 1
+        while True:
+            try:
+                self.phrases.put_nowait(item)
+                return
+            except queue.Full:
+                # Keep the newest audio, drop the oldest phrase
+                try:
+                    self.phrases.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get_phrase(self, timeout=None):
+        """Return the next captured AudioData, or None if nothing arrived in time"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                started_at, ended_at, audio = self.phrases.get(timeout=remaining)
+            except queue.Empty:
+                return None
+
+            if time.monotonic() - ended_at <= self.max_age:
+                return audio
+            self.dropped += 1
+
+    def flush(self):
+        """Discard every queued phrase"""
+        while True:
+            try:
+                self.phrases.get_nowait()
+            except queue.Empty:
+                return
+
+    def stats(self):
+        """Capture counters, plus noise floor and SNR when tracked"""
+        stats = {
+            'captured': self.captured,
+            'dropped': self.dropped,
+            'muted': self.muted,
+            'queued': self.phrases.qsize(),
+        }
+        if self.noise_tracker:
+            stats.update(self.noise_tracker.stats())
+        if self.barge_in:
+            stats.update(self.barge_in.stats())
+        return stats
+
+
+class _TappedStream:
+    """Wraps a microphone stream so every buffer recognizer.listen() reads is also measured"""
+
+    def __init__(self, stream, on_buffer):
+        self._stream = stream
+        self._on_buffer = on_buffer
+
+    def read(self, size):
+        data = self._stream.read(size)
+        if data:
+            self._on_buffer(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class NoiseFloorTracker:
+    """
+    Continuous ambient-noise estimate from the live stream, replacing one-shot calibration
+    The floor is a low percentile of recent buffer energies (speech has gaps, a fan does not),
+    smoothed so it falls quickly and rises slowly; the threshold only moves past a hysteresis band
+    """
+
+    def __init__(self, recognizer, window_seconds=4.0, percentile=20, threshold_ratio=2.5,
+                 rise_seconds=3.0, fall_seconds=0.5, hysteresis=0.15, min_threshold=50,
+                 max_threshold=4000, persist_path=DEFAULT_NOISE_PATH, max_saved_age=7 * 24 * 60 * 60):
+        self.recognizer = recognizer
+        self.window_seconds = window_seconds
+        self.percentile = percentile
+        # Speech must be this many times louder than the floor (2.5x is about 8 dB)
+        self.threshold_ratio = threshold_ratio
+        self.rise_seconds = rise_seconds
+        self.fall_seconds = fall_seconds
+        # Fractional change needed before energy_threshold is updated
+        self.hysteresis = hysteresis
+        self.min_threshold = min_threshold
+        self.max_threshold = max_threshold
+        self.persist_path = persist_path
+        self.max_saved_age = max_saved_age
+
+        self.noise_floor = None
+        self.speech_level = None
+        self.buffers = 0
+        self.updates = 0
+
+        self._energies = None
+        self._seconds_per_buffer = None
+        self._dtype = None
+
+    def load(self):
+        """Apply the last saved threshold; True if one was recent enough to skip calibration"""
+        if not self.persist_path:
+            return False
+        try:
+            with open(self.persist_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if time.time() - saved['saved_at'] > self.max_saved_age:
+                return False
+            self.noise_floor = float(saved['noise_floor'])
+            self.recognizer.energy_threshold = float(saved['energy_threshold'])
+            return True
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"⚠️  Could not load noise calibration: {e}")
+            return False
+
+    def save(self):
+        """Persist the current floor and threshold for the next start"""
+        if not self.persist_path or self.noise_floor is None:
+            return
+        directory = os.path.dirname(self.persist_path) or '.'
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(suffix='.part', dir=directory)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'noise_floor': self.noise_floor,
+                    'energy_threshold': self.recognizer.energy_threshold,
+                    'saved_at': time.time(),
+                }, f)
+            os.replace(temp_path, self.persist_path)
+        except OSError as e:
+            print(f"⚠️  Could not save noise calibration: {e}")
+
+    def attach(self, source):
+        """Tap an entered microphone source; the tracker now owns energy_threshold"""
+        self._seconds_per_buffer = float(source.CHUNK) / source.SAMPLE_RATE
+        self._dtype = {1: np.int8, 2: np.int16, 4: np.int32}.get(source.SAMPLE_WIDTH)
+        self._energies = deque(maxlen=max(int(self.window_seconds / self._seconds_per_buffer), 1))
+        self.recognizer.dynamic_energy_threshold = False
+        source.stream = _TappedStream(source.stream, self.observe)
+
+    def observe(self, data):
+        """Update the estimate with one raw buffer"""
+        if self._dtype is None:
+            return
+        samples = np.frombuffer(data, dtype=self._dtype).astype(np.float64)
+        if samples.size == 0:
+            return
+        energy = float(np.sqrt(np.mean(samples * samples)))
+        self.buffers += 1
+        self._energies.append(energy)
+
+        if energy > self.recognizer.energy_threshold:
+            # Loud buffer: count it toward the speech level, not the floor
+            self.speech_level = energy if self.speech_level is None else 0.9 * self.speech_level + 0.1 * energy
+
+        estimate = float(np.percentile(self._energies, self.percentile))
+        if self.noise_floor is None:
+            self.noise_floor = estimate
+        else:
+            time_constant = self.rise_seconds if estimate > self.noise_floor else self.fall_seconds
+            alpha = 1 - math.exp(-self._seconds_per_buffer / time_constant)
+            self.noise_floor += alpha * (estimate - self.noise_floor)
+
+        # Wait for half a window before trusting the percentile
+        if len(self._energies) >= self._energies.maxlen // 2:
+            self._apply_threshold()
+
+    def _apply_threshold(self):
+        target = min(max(self.noise_floor * self.threshold_ratio, self.min_threshold), self.max_threshold)
+        current = self.recognizer.energy_threshold
+        if abs(target - current) > current * self.hysteresis:
+            self.recognizer.energy_threshold = target
+            self.updates += 1
+
+    @property
+    def snr_db(self):
+        """Recent speech level over the noise floor, in dB (None until speech was heard)"""
+        if not self.speech_level or not self.noise_floor:
+            return None
+        return 20 * math.log10(self.speech_level / max(self.noise_floor, 1e-6))
+
+    def stats(self):
+        """Current noise floor, threshold and SNR"""
+        snr = self.snr_db
+        return {
+            'noise_floor': round(self.noise_floor, 1) if self.noise_floor is not None else None,
+            'energy_threshold': round(self.recognizer.energy_threshold, 1),
+            'snr_db': round(snr, 1) if snr is not None else None,
+            'buffers': self.buffers,
+            'threshold_updates': self.updates,
+        }
+
+
+class BargeInDetector:
+    """
+    Spots the user talking over our own playback, from the same raw buffers as the noise tracker
+    There is no echo reference, so the echo level is learned while we speak: a barge-in is voiced
+    audio well above the loud end of that echo, held for min_speech_ms
+    """
+
+    def __init__(self, recognizer, is_active, on_barge_in, echo_percentile=90, echo_ratio=1.5,
+                 window_seconds=2.0, warmup_ms=250, min_speech_ms=150, min_zcr=0.01, max_zcr=0.3,
+                 max_onsets=4):
+        self.recognizer = recognizer
+        # is_active() -> True while we are playing speech; on_barge_in(onset) should stop it
+        self.is_active = is_active
+        self.on_barge_in = on_barge_in
+        # Speech must beat this percentile of the recent echo energy by echo_ratio
+        self.echo_percentile = echo_percentile
+        self.echo_ratio = echo_ratio
+        self.window_seconds = window_seconds
+        # Playback time spent learning the echo before anything can trigger
+        self.warmup_ms = warmup_ms
+        self.min_speech_ms = min_speech_ms
+        # Zero-crossing rate band for voiced sound (clicks and hiss fall outside it)
+        self.min_zcr = min_zcr
+        self.max_zcr = max_zcr
+
+        self.barge_ins = 0
+        self.total_reaction_ms = 0.0
+        self.max_reaction_ms = 0.0
+        # Monotonic onset times of recent barge-ins, for AudioCapture to keep those phrases
+        self.onsets = deque(maxlen=max_onsets)
+
+        self._seconds_per_buffer = None
+        self._dtype = None
+        self._echo = None
+        self._active_since = None
+        self._run_start = None
+        self._fired = False
+
+    def attach(self, source):
+        """Tap an entered microphone source"""
+        self._seconds_per_buffer = float(source.CHUNK) / source.SAMPLE_RATE
+        self._dtype = {1: np.int8, 2: np.int16, 4: np.int32}.get(source.SAMPLE_WIDTH)
+        self._echo = deque(maxlen=max(int(self.window_seconds / self._seconds_per_buffer), 1))
+        source.stream = _TappedStream(source.stream, self.observe)
+
+    def observe(self, data):
+        """Check one raw buffer; calls on_barge_in once per utterance we are interrupted in"""
+        if self._dtype is None:
+            return
+        if not self.is_active():
+            self._active_since = None
+            return
+
+        now = time.monotonic()
+        if self._active_since is None:
+            # New utterance: relearn the echo, the volume or the voice may have changed
+            self._active_since = now
+            self._echo.clear()
+            self._run_start = None
+            self._fired = False
+        if self._fired:
+            return
+
+        samples = np.frombuffer(data, dtype=self._dtype).astype(np.float64)
+        if samples.size < 2:
+            return
+        energy = float(np.sqrt(np.mean(samples * samples)))
+        signs = np.signbit(samples)
+        zcr = float(np.mean(signs[1:] != signs[:-1]))
+
+        warming_up = (now - self._active_since) * 1000 < self.warmup_ms
+        threshold = self.recognizer.energy_threshold
+        if self._echo and not warming_up:
+            threshold = max(threshold, float(np.percentile(self._echo, self.echo_percentile)) * self.echo_ratio)
+
+        if warming_up or energy <= threshold:
+            # Echo (or silence): learn from it, and any run of loud buffers is over
+            self._echo.append(energy)
+            self._run_start = None
+            return
+        if not self.min_zcr <= zcr <= self.max_zcr:
+            self._run_start = None
+            return
+
+        if self._run_start is None:
+            self._run_start = now - self._seconds_per_buffer
+        if (now - self._run_start) * 1000 >= self.min_speech_ms:
+            self._fired = True
+            self._trigger(self._run_start)
+
+    def _trigger(self, onset):
+        self.onsets.append(onset)
+        self.on_barge_in(onset)
+        # Onset of speech until playback has been told to stop
+        reaction_ms = (time.monotonic() - onset) * 1000
+        self.barge_ins += 1
+        self.total_reaction_ms += reaction_ms
+        self.max_reaction_ms = max(self.max_reaction_ms, reaction_ms)
+
+    def onset_within(self, started_at, ended_at):
+        """The latest barge-in onset inside [started_at, ended_at], or None"""
+        for onset in reversed(self.onsets):
+            if started_at <= onset <= ended_at:
+                return onset
+        return None
+
+    def stats(self):
+        """How often playback was interrupted and how quickly"""
+        return {
+            'barge_ins': self.barge_ins,
+            'avg_reaction_ms': round(self.total_reaction_ms / self.barge_ins, 1) if self.barge_ins else None,
+            'max_reaction_ms': round(self.max_reaction_ms, 1) if self.barge_ins else None,
+        }
+
+
+class VoiceActivityGate:
+    """Offline check that a phrase plausibly holds a wake word before it goes to the cloud"""
+
+    def __init__(self, frame_ms=20, energy_ratio=3.0, min_zcr=0.005, max_zcr=0.3,
+                 max_flatness=0.45, min_band_ratio=0.5, band_hz=(90, 3400), min_speech_ms=150,
+                 max_speech_ms=1800):
+        self.frame_ms = frame_ms
+        # A speech frame is this many times louder than the phrase's quietest frames
+        self.energy_ratio = energy_ratio
+        # Zero-crossing rate band for voiced speech (noise and hiss cross far more often);
+        # a 20 ms frame of an 85 Hz voice may cross only three times, 0.009 at 16 kHz
+        self.min_zcr = min_zcr
+        self.max_zcr = max_zcr
+        # Spectral flatness: 1.0 is white noise, speech is well below that
+        self.max_flatness = max_flatness
+        # Share of energy that must sit in the speech band; it starts below the lowest voice
+        # pitch (~85 Hz), since a deep voice's fundamental carries much of its energy
+        self.min_band_ratio = min_band_ratio
+        self.band_hz = band_hz
+        # Total voiced time that fits a wake word or short wake phrase
+        self.min_speech_ms = min_speech_ms
+        self.max_speech_ms = max_speech_ms
+
+        self.checked = 0
+        self.forwarded = 0
+        self.rejected = 0
+
+    def analyze(self, audio):
+        """Return per-phrase features: voiced milliseconds and frame statistics"""
+        samples = np.frombuffer(audio.get_raw_data(convert_width=2), dtype=np.int16)
+        samples = samples.astype(np.float32) / 32768.0
+
+        frame_len = max(int(audio.sample_rate * self.frame_ms / 1000), 1)
+        n_frames = len(samples) // frame_len
+        if n_frames == 0:
+            return {'speech_ms': 0, 'frames': 0, 'speech_frames': 0}
+        frames = samples[:n_frames * frame_len].reshape(n_frames, frame_len)
+
+        rms = np.sqrt(np.mean(frames ** 2, axis=1))
+        noise_floor = max(float(np.percentile(rms, 20)), 1e-4)
+
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+        spectrum = np.abs(np.fft.rfft(frames * np.hanning(frame_len), axis=1)) ** 2 + 1e-12
+        flatness = np.exp(np.mean(np.log(spectrum), axis=1)) / np.mean(spectrum, axis=1)
+        freqs = np.fft.rfftfreq(frame_len, d=1.0 / audio.sample_rate)
+        band = (freqs >= self.band_hz[0]) & (freqs <= self.band_hz[1])
+        band_ratio = spectrum[:, band].sum(axis=1) / spectrum.sum(axis=1)
+
+        speech = (
+            (rms > noise_floor * self.energy_ratio)
+            & (zcr >= self.min_zcr) & (zcr <= self.max_zcr)
+            & (flatness <= self.max_flatness)
+            & (band_ratio >= self.min_band_ratio)
+        )
+        speech_frames = int(speech.sum())
+        return {
+            'speech_ms': speech_frames * self.frame_ms,
+            'frames': n_frames,
+            'speech_frames': speech_frames,
+            'noise_floor': noise_floor,
+            'peak_rms': float(rms.max()),
+        }
+
+    def accept(self, audio):
+        """True if the phrase should be sent to speech recognition"""
+        self.checked += 1
+        speech_ms = self.analyze(audio)['speech_ms']
+        if self.min_speech_ms <= speech_ms <= self.max_speech_ms:
+            self.forwarded += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def stats(self):
+        """How many phrases were checked and how many cloud calls were saved"""
+        return {
+            'checked': self.checked,
+            'forwarded': self.forwarded,
+            'cloud_calls_saved': self.rejected,
+        }
+
+
+# Test function
+def test_audio_capture():
+    """Capture a few phrases from the default microphone"""
+    print("\n" + "=" * 60)
+    print("TESTING AUDIO CAPTURE")
+    print("=" * 60)
+
+    capture = AudioCapture(sr.Recognizer(), sr.Microphone(), phrase_time_limit=3)
+    capture.start()
+    print("\n🎤 Say a few short phrases (10 seconds)...")
+
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        audio = capture.get_phrase(timeout=deadline - time.monotonic())
+        if audio:
+            seconds = len(audio.frame_data) / float(audio.sample_rate * audio.sample_width)
+            print(f"   Captured phrase: {seconds:.1f}s")
+
+    capture.stop()
+    print(f"\nStats: {capture.stats()}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_audio_capture()
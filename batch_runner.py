@@ -0,0 +1,191 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from command_processor import CommandProcessor, SessionState
+from stub_search import StubInternetSearch
+
+
+class SlowStubInternetSearch(StubInternetSearch):
+    """Stub answers after a fixed delay on network-bound calls, to model fetch latency"""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def _wait(self):
+        time.sleep(self.latency)
+
+    def get_weather_basic(self, city="your location"):
+        self._wait()
+        return super().get_weather_basic(city)
+
+    def get_news_basic(self):
+        self._wait()
+        return super().get_news_basic()
+
+    def search_web_simple(self, query):
+        self._wait()
+        return super().search_web_simple(query)
+
+
+def read_utterances(path):
+    """
+    Yield {'id', 'text', 'expected_intent'} from a .jsonl, .csv or plain text file
+    JSONL/CSV rows need a "text" field; "id" and "expected_intent" are optional
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if extension == '.csv':
+            rows = csv.DictReader(f)
+        elif extension in ('.jsonl', '.json'):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = ({'text': line.rstrip('\n')} for line in f if line.strip())
+
+        for number, row in enumerate(rows, 1):
+            text = row.get('text') or row.get('utterance')
+            if not text:
+                continue
+            yield {
+                'id': row.get('id') or number,
+                'text': text,
+                'expected_intent': row.get('expected_intent') or None,
+            }
+
+
+def run_one(processor, item):
+    """Process one utterance in its own session; returns the output record"""
+    record = dict(item)
+    text = item['text'].lower().strip()
+    start = time.perf_counter()
+    try:
+        # One match serves both the reported intent and the response
+        record['intent'], slots = processor.match_intent(text)
+        record['response'] = processor.respond(record['intent'], slots, text, SessionState()) if text else None
+        record['error'] = None
+    except Exception as e:
+        record.setdefault('intent', None)
+        record['response'] = None
+        record['error'] = f"{type(e).__name__}: {e}"
+    record['ms'] = round((time.perf_counter() - start) * 1000, 3)
+    if item['expected_intent'] is None:
+        del record['expected_intent']
+    return record
+
+
+def run_batch(processor, items, workers=8, output=None):
+    """Fan items out over a worker pool, write records in input order, return the summary"""
+    latencies = []
+    intents = Counter()
+    errors = 0
+    checked = 0
+    mismatches = 0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+        for record in pool.map(lambda item: run_one(processor, item), items):
+            latencies.append(record['ms'])
+            intents[record['intent'] or 'unknown'] += 1
+            if record['error']:
+                errors += 1
+            if record.get('expected_intent'):
+                checked += 1
+                if record['expected_intent'] != (record['intent'] or 'unknown'):
+                    mismatches += 1
+                    record['mismatch'] = True
+            if output:
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    def percentile(pct):
+        return latencies[min(int(len(latencies) * pct / 100), len(latencies) - 1)] if latencies else 0.0
+
+    return {
+        'utterances': len(latencies),
+        'workers': workers,
+        'seconds': round(elapsed, 3),
+        'per_second': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(50),
+        'p90_ms': percentile(90),
+        'p99_ms': percentile(99),
+        'max_ms': latencies[-1] if latencies else 0.0,
+        'errors': errors,
+        'checked': checked,
+        'mismatches': mismatches,
+        'intents': dict(intents.most_common()),
+    }
+
+
+def print_summary(summary):
+    """Print throughput, latency and the intent distribution"""
+    print("\n" + "=" * 60)
+    print("📦 BATCH SUMMARY")
+    print("=" * 60)
+    print(f"   Utterances: {summary['utterances']} with {summary['workers']} workers "
+          f"in {summary['seconds']:.2f}s ({summary['per_second']:,.1f}/s)")
+    print(f"   Latency: p50 {summary['p50_ms']:.1f} ms, p90 {summary['p90_ms']:.1f} ms, "
+          f"p99 {summary['p99_ms']:.1f} ms, max {summary['max_ms']:.1f} ms")
+    print(f"   Errors: {summary['errors']}")
+    if summary['checked']:
+        print(f"   Intent mismatches: {summary['mismatches']} of {summary['checked']} checked")
+
+    print("\n   Intents:")
+    total = summary['utterances'] or 1
+    for intent, count in summary['intents'].items():
+        print(f"   {intent:<14} {count:>7} {count * 100 / total:>6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay utterance files through the command pipeline")
+    parser.add_argument("input", help=".jsonl or .csv with a 'text' column (or one utterance per line)")
+    parser.add_argument("-o", "--output", help="write one JSON record per utterance here ('-' for stdout)")
+    parser.add_argument("-w", "--workers", type=int, default=8)
+    parser.add_argument("--stub", action="store_true", help="answer with StubInternetSearch, no network")
+    parser.add_argument("--stub-latency", type=float, default=0.0,
+                        help="seconds a stubbed weather/news/search call takes")
+    parser.add_argument("--summary-json", help="write the aggregate summary to this file")
+    parser.add_argument("--check", action="store_true", help="exit 1 if any expected_intent mismatches")
+    args = parser.parse_args()
+
+    if args.stub:
+        internet = SlowStubInternetSearch(args.stub_latency) if args.stub_latency else StubInternetSearch()
+    else:
+        from internet_search import InternetSearch
+        internet = InternetSearch()
+    processor = CommandProcessor(internet)
+
+    items = list(read_utterances(args.input))
+    if args.output == '-':
+        output = sys.stdout
+    elif args.output:
+        output = open(args.output, 'w', encoding='utf-8')
+    else:
+        output = None
+
+    try:
+        summary = run_batch(processor, items, workers=args.workers, output=output)
+    finally:
+        if output and output is not sys.stdout:
+            output.close()
+        if hasattr(internet, 'close'):
+            internet.close()
+
+    print_summary(summary)
+    if args.summary_json:
+        with open(args.summary_json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+    if args.check and summary['mismatches']:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
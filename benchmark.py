@@ -0,0 +1,370 @@
+import argparse
+import gc
+import glob
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from calculator import SafeCalculator
+from command_processor import CommandProcessor
+from html_extract import DuckDuckGoExtractor, ParagraphExtractor, feed_until_done
+from internet_search import InternetSearch
+from stub_search import StubInternetSearch
+from voice_engine_gtts import VoiceEngine
+
+
+WAKE_WORDS = ["niley", "N", "alexa", "siri", "na", "Nelly", "milo", "naahi lla", "nil", "kizim",
+              "niall", "Miley", "Nai", "nale", "noi", "Laila", "janim", "sanam", "Jaana", "jannu",
+              "honey", "sweetie", "baby"]
+
+DEFAULT_BASELINE = "benchmark_baseline.json"
+# Saved pages named duckduckgo*.html / wikipedia*.html; synthetic pages are used if absent
+DEFAULT_HTML_FIXTURES = "benchmark_fixtures"
+
+
+def generate_corpus(size=5000, seed=42):
+    """Deterministic utterances covering every intent, near-misses and long inputs"""
+    rng = random.Random(seed)
+    cities = ["london", "new york", "paris", "istanbul", "san francisco", "tokyo", "rio de janeiro"]
+    topics = ["artificial intelligence", "the moon", "python programming", "quantum physics",
+              "the roman empire", "black holes", "machine learning"]
+    names = ["alex", "sam", "jaana", "mehmet", "priya"]
+    numbers = ["5", "15", "27", "3.5", "100", "(4 + 2)"]
+    operators = ["+", "-", "*", "/"]
+
+    def expression():
+        parts = [rng.choice(numbers)]
+        for _ in range(rng.randint(1, 3)):
+            parts += [rng.choice(operators), rng.choice(numbers)]
+        return " ".join(parts)
+
+    templates = [
+        lambda: rng.choice(["hello", "hi niley", "hey", "good morning", "good evening niley"]),
+        lambda: rng.choice(["what's the time", "what is the time", "current time", "tell me the time"]),
+        lambda: rng.choice(["what's the date", "today's date", "current date"]),
+        lambda: f"what's the weather in {rng.choice(cities)}",
+        lambda: f"forecast for {rng.choice(cities)}",
+        lambda: rng.choice(["is it going to rain", "what's the weather like", "temperature outside"]),
+        lambda: rng.choice(["tell me the news", "headlines please", "what's happening"]),
+        lambda: f"search for {rng.choice(topics)}",
+        lambda: f"tell me about {rng.choice(topics)}",
+        lambda: f"who is the president of {rng.choice(cities)}",
+        lambda: rng.choice(["tell me a joke", "make me laugh", "joke"]),
+        lambda: f"my name is {rng.choice(names)}",
+        lambda: rng.choice(["thank you", "thanks a lot", "i appreciate it"]),
+        lambda: rng.choice(["how are you", "how do you feel", "are you ok"]),
+        lambda: rng.choice(["what can you do", "help", "your abilities"]),
+        lambda: f"calculate {expression()}",
+        lambda: f"what is {expression()}",
+        lambda: f"solve {expression()}",
+        lambda: rng.choice(["stop", "goodbye", "see you later", "quit"]),
+        lambda: rng.choice(["i love you", "i like you", "adore you"]),
+        lambda: rng.choice(["who made you", "who created you", "who built you"]),
+    ]
+    near_misses = [
+        "and then", "nothing much", "weathering the storm", "the newsletter arrived",
+        "nil desperandum", "this that and the other", "random unknown command", "okay",
+        "nah", "stopwatch", "sunnydale", "knowledge",
+        # Almost arithmetic: must fail fast, not backtrack through every way to split it
+        "what is " + "1 + " * 18 + "foo",
+    ]
+    wake_phrases = [
+        "hey niley", "ok nil", "merhaba jaana", "niley wake up", "wake up alexa",
+        "niall are you there", "hello naahi lla", "hey siri what's up",
+    ]
+    filler = ("so anyway i was thinking about what we talked about yesterday and "
+              "whether it makes sense to keep going with the plan or not ")
+
+    corpus = []
+    for i in range(size):
+        roll = rng.random()
+        if roll < 0.6:
+            text = rng.choice(templates)()
+        elif roll < 0.75:
+            text = rng.choice(near_misses)
+        elif roll < 0.9:
+            text = rng.choice(wake_phrases)
+        else:
+            # Long input, with an intent buried somewhere inside
+            text = filler * rng.randint(2, 8) + rng.choice(templates)()
+        corpus.append(text)
+    return corpus
+
+
+def measure(func, inputs, rounds=5, warmup=1):
+    """
+    Time func over inputs
+    Throughput is the best round (least disturbed by the OS), percentiles are the median round
+    """
+    for _ in range(warmup):
+        for item in inputs:
+            func(item)
+
+    throughputs = []
+    latencies = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            round_latencies = []
+            start = time.perf_counter()
+            for item in inputs:
+                t0 = time.perf_counter_ns()
+                func(item)
+                round_latencies.append(time.perf_counter_ns() - t0)
+            elapsed = time.perf_counter() - start
+            throughputs.append(len(inputs) / elapsed)
+            latencies.append(sorted(round_latencies))
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    def percentile(values, pct):
+        return values[min(int(len(values) * pct / 100), len(values) - 1)] / 1000.0
+
+    return {
+        'calls': len(inputs),
+        'ops_per_sec': max(throughputs),
+        'p50_us': statistics.median(percentile(v, 50) for v in latencies),
+        'p99_us': statistics.median(percentile(v, 99) for v in latencies),
+    }
+
+
+def measure_memory(func, item):
+    """Peak traced allocation in KiB for a single call"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func(item)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024.0
+
+
+def synthetic_html_fixtures(seed=42):
+    """Pages shaped like the real ones: heavy <head>, the answer early, lots of markup after it"""
+    rng = random.Random(seed)
+    words = ("python language program code data system design history science music city "
+             "river mountain energy network computer model theory culture").split()
+
+    def sentence(n):
+        return " ".join(rng.choice(words) for _ in range(n)).capitalize() + "."
+
+    head = ("<head><meta charset='utf-8'><title>results</title>"
+            + "".join(f"<link rel='stylesheet' href='/s{i}.css'>" for i in range(20))
+            + "<script>" + "var a = 1;" * 2000 + "</script></head>")
+
+    results = []
+    for i in range(30):
+        results.append(
+            f"<div class='result results_links web-result'><div class='links_main result__body'>"
+            f"<h2 class='result__title'><a class='result__a' href='https://example.com/{i}'>"
+            f"{sentence(6)}</a></h2><a class='result__url' href='https://example.com/{i}'>"
+            f"example.com/{i}</a><div class='result__snippet'>{sentence(40)}</div></div></div>"
+        )
+    duckduckgo = f"<html>{head}<body><div id='links'>{''.join(results)}</div></body></html>"
+
+    infobox = "<table class='infobox'>" + "<tr><th>Key</th><td>Value <a href='#'>link</a></td></tr>" * 60 + "</table>"
+    sections = []
+    for i in range(80):
+        paragraphs = "".join(f"<p>{sentence(80)} <a href='/wiki/{i}'>{sentence(2)}</a> {sentence(40)}</p>"
+                             for _ in range(4))
+        sections.append(f"<h2>Section {i}</h2>{paragraphs}<ul>" + "<li>item</li>" * 20 + "</ul>")
+    wikipedia = (f"<html>{head}<body><div id='content'><p class='mw-empty-elt'>\n</p>{infobox}"
+                 f"{''.join(sections)}</div></body></html>")
+
+    return {'duckduckgo': duckduckgo, 'wikipedia': wikipedia}
+
+
+def load_html_fixtures(directory=DEFAULT_HTML_FIXTURES, seed=42):
+    """{name: html} from saved pages, falling back to synthetic ones"""
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if name.startswith(("duckduckgo", "wikipedia")):
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                fixtures[name] = f.read()
+    return fixtures or synthetic_html_fixtures(seed)
+
+
+def build_html_suite(fixtures, chunk_size=16 * 1024):
+    """Full BeautifulSoup parse versus streaming targeted extraction, per fixture"""
+    try:
+        from bs4 import BeautifulSoup
+    except ImportError:
+        BeautifulSoup = None
+
+    def bs4_duckduckgo(html):
+        soup = BeautifulSoup(html, 'html.parser')
+        answer = soup.find('div', class_='result__snippet')
+        return answer.get_text() if answer else soup.find('a', class_='result__url')
+
+    def bs4_wikipedia(html):
+        for paragraph in BeautifulSoup(html, 'html.parser').find_all('p'):
+            if paragraph.text.strip() and len(paragraph.text) > 50:
+                return paragraph.text
+
+    def targeted(make_parser):
+        def run(body):
+            # Same chunking as the streamed response body
+            chunks = (body[i:i + chunk_size] for i in range(0, len(body), chunk_size))
+            feed_until_done(make_parser(), chunks)
+        return run
+
+    suite = []
+    for name, html in fixtures.items():
+        body = html.encode('utf-8')
+        if name.startswith('duckduckgo'):
+            full, make_parser = bs4_duckduckgo, DuckDuckGoExtractor
+        else:
+            full, make_parser = bs4_wikipedia, ParagraphExtractor
+        if BeautifulSoup:
+            suite.append((f'html_{name}_bs4', full, [html] * 3))
+        suite.append((f'html_{name}_targeted', targeted(make_parser), [body] * 3))
+    return suite
+
+
+def build_suite(corpus):
+    """Return [(name, func, inputs)] for every CPU-only path we care about"""
+    processor = CommandProcessor(StubInternetSearch())
+    processor_inputs = [text.lower() for text in corpus]
+
+    # Only the wake-word matcher is needed, not the microphone or mixer
+    voice = VoiceEngine.__new__(VoiceEngine)
+    voice.wake_words = WAKE_WORDS
+
+    internet = InternetSearch.__new__(InternetSearch)
+    internet.calculator = SafeCalculator()
+    expressions = [processor.extract_calculation(text) or "1 + 1" for text in processor_inputs
+                   if 'calculate' in text or 'solve' in text or 'what is' in text]
+    # The corpus repeats a few expressions, so 'calculate' is mostly memo hits; these miss every time
+    uncached = InternetSearch.__new__(InternetSearch)
+    uncached.calculator = SafeCalculator(cache_size=0)
+    spoken = [expression.replace('+', 'plus').replace('-', 'minus').replace('*', 'times').replace('/', 'over')
+              for expression in expressions]
+
+    return [
+        ('process_command', processor.process_command, processor_inputs),
+        ('match_intent', processor.match_intent, processor_inputs),
+        ('extract_city', processor.extract_city, processor_inputs),
+        ('extract_search_query', processor.extract_search_query, processor_inputs),
+        ('extract_calculation', processor.extract_calculation, processor_inputs),
+        ('detect_wake_word', voice.detect_wake_word, corpus),
+        ('calculate', internet.calculate, expressions),
+        ('calculate_uncached', uncached.calculate, expressions),
+        ('calculate_uncached_spoken', uncached.calculate, spoken),
+        ('eval_reference', _eval_reference, expressions),
+    ]
+
+
+def _eval_reference(expression):
+    """
+    Benchmark only: the eval() that calculate() used before SafeCalculator, kept as the speed
+    to beat; unsafe on untrusted input, so nothing outside this file may call it
+    """
+    try:
+        return eval(expression, {'__builtins__': {}})
+    except (SyntaxError, ZeroDivisionError):
+        return None  # the old path answered these with an apology
+
+
+def compare(results, baseline, tolerance=0.15, p99_tolerance=0.5):
+    """Return a list of regressions versus a stored baseline (tail latency is noisier, so looser)"""
+    regressions = []
+    for name, current in results['benchmarks'].items():
+        previous = baseline.get('benchmarks', {}).get(name)
+        if not previous:
+            continue
+        if current['ops_per_sec'] < previous['ops_per_sec'] * (1 - tolerance):
+            regressions.append(f"{name}: {current['ops_per_sec']:.0f} ops/s "
+                               f"(baseline {previous['ops_per_sec']:.0f})")
+        if current['p99_us'] > previous['p99_us'] * (1 + p99_tolerance):
+            regressions.append(f"{name}: p99 {current['p99_us']:.1f} µs "
+                               f"(baseline {previous['p99_us']:.1f})")
+    return regressions
+
+
+def run_benchmarks(size=5000, rounds=5, seed=42, only=None, html_fixtures=DEFAULT_HTML_FIXTURES):
+    """Run the suite and return a JSON-serialisable result"""
+    corpus = generate_corpus(size, seed)
+    html_suite = build_html_suite(load_html_fixtures(html_fixtures, seed))
+    results = {
+        'python': sys.version.split()[0],
+        'corpus_size': size,
+        'rounds': rounds,
+        'seed': seed,
+        'benchmarks': {},
+    }
+
+    for name, func, inputs in build_suite(corpus) + html_suite:
+        if only and name not in only:
+            continue
+        stats = measure(func, inputs, rounds=rounds)
+        line = (f"  {name:<26} {stats['ops_per_sec']:>12,.0f} ops/s   "
+                f"p50 {stats['p50_us']:>8.1f} µs   p99 {stats['p99_us']:>8.1f} µs")
+        if name.startswith('html_'):
+            stats['peak_kb'] = measure_memory(func, inputs[0])
+            line += f"   peak {stats['peak_kb']:>8.0f} KiB"
+        results['benchmarks'][name] = stats
+        print(line)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU micro-benchmarks for Niley")
+    parser.add_argument("--size", type=int, default=5000, help="utterances in the generated corpus")
+    parser.add_argument("--rounds", type=int, default=5, help="timed rounds per benchmark")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", nargs="*", help="run only these benchmarks")
+    parser.add_argument("--html-fixtures", default=DEFAULT_HTML_FIXTURES,
+                        help="directory of saved duckduckgo*/wikipedia*.html pages")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed throughput drop before failing")
+    parser.add_argument("--p99-tolerance", type=float, default=0.5, help="allowed p99 increase before failing")
+    args = parser.parse_args()
+
+    print("\n" + "=" * 60)
+    print("⏱️  NILEY CPU BENCHMARKS")
+    print("=" * 60)
+
+    results = run_benchmarks(args.size, args.rounds, args.seed, args.only, args.html_fixtures)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results saved to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Baseline saved to {args.baseline}")
+        return 0
+
+    try:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(f"\nNo baseline at {args.baseline} (run with --save-baseline to create one)")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance, args.p99_tolerance)
+    if regressions:
+        print("\n❌ Regressions:")
+        for line in regressions:
+            print(f"   {line}")
+        return 1
+
+    print("\n✅ No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
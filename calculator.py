@@ -0,0 +1,322 @@
+import math
+import operator
+import re
+from functools import lru_cache
+
+
+class CalculationError(ValueError):
+    """Raised for expressions we refuse or cannot evaluate; the message is user facing"""
+
+
+UNITS = {
+    'zero': 0, 'oh': 0, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+    'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12,
+    'thirteen': 13, 'fourteen': 14, 'fifteen': 15, 'sixteen': 16, 'seventeen': 17,
+    'eighteen': 18, 'nineteen': 19,
+}
+TENS = {
+    'twenty': 20, 'thirty': 30, 'forty': 40, 'fifty': 50,
+    'sixty': 60, 'seventy': 70, 'eighty': 80, 'ninety': 90,
+}
+SCALES = {'hundred': 100, 'thousand': 1000, 'million': 10 ** 6, 'billion': 10 ** 9}
+
+# Spoken operators; multi-word ones are read as one token, keyed by their first word
+OPERATOR_WORDS = {
+    'plus': '+', 'add': '+', 'minus': '-', 'subtract': '-', 'negative': '-',
+    'times': '*', 'x': '*', 'over': '/', 'mod': '%', 'modulo': '%',
+    'squared': '** 2', 'cubed': '** 3',
+}
+OPERATOR_PHRASES = {
+    'multiplied': '*', 'divided': '/', 'to': '**', 'raised': '**',
+    'close': ')', 'open': '(', 'bracket': '(', 'parenthesis': '(',
+}
+FILLER_WORDS = {'and', 'what', 'is', 'equals', 'equal', 'calculate', 'solve', 'please', 'by', 'the'}
+
+_NUMBER_WORDS = sorted(set(UNITS) | set(TENS) | set(SCALES) | {'point', 'and'}, key=len, reverse=True)
+# Filler like "the", "to" and "by" is only accepted inside these phrases, so
+# "what is the 3 body problem" is not an expression
+_OPERATOR_TOKENS = [
+    r'multiplied\s+by', r'divided\s+by', r'(?:to\s+the\s+power\s+of|raised\s+to(?:\s+the\s+power\s+of)?)',
+] + sorted(OPERATOR_WORDS, key=len, reverse=True)
+_BRACKETS = r'(?:(?:open|close)\s+)?(?:bracket|parenthesis)'
+
+# Used by CommandProcessor: a run of numbers (digits, "1,000", number words), brackets and
+# operators that contains at least one operator ("15 times 27", "3 x 4", "(3+4)*2").
+# Operands and operators never overlap and a number can only be read one way, so the
+# run splits into tokens in exactly one way and a near-miss fails in linear time
+# instead of backtracking through every split; "x" only counts right after a digit
+_NUMBER = r'(?:(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?|(?<!\d)\.\d+)(?!\d)'
+_OPERAND = (r'(?:' + _NUMBER + r'|[()]|\b' + _BRACKETS + r'\b|\b(?:'
+            + '|'.join(_NUMBER_WORDS) + r')\b)')
+_OPERATOR = (r'(?:[+\-*/%^]|(?<=\d)x(?=\s*\d)|(?<=\d\s)x(?=\s*\d)|\b(?:'
+             + '|'.join(w for w in _OPERATOR_TOKENS if w != 'x') + r')\b)')
+EXPRESSION_PATTERN = rf'(?:{_OPERAND}\s*)*{_OPERATOR}(?:\s*(?:{_OPERAND}|{_OPERATOR}))*'
+
+# One pass over spoken text: (operator phrase, other token)
+_SPOKEN_TOKEN = re.compile(
+    r'\b(multiplied\s+by|divided\s+by|to\s+the\s+power\s+of|raised\s+to(?:\s+the\s+power\s+of)?'
+    r'|(?:open\s+|close\s+)?(?:bracket|parenthesis))\b|(\d+(?:\.\d+)?|\*\*|[-+*/%()^]|[a-z]+)'
+)
+# Symbolic expressions; anything else becomes a one-character token the parser rejects
+_SYMBOL_TOKEN = re.compile(r'\d+\.?\d*|\.\d+|\*\*|//|\S')
+_NUMBER_PARTS = frozenset(UNITS) | frozenset(TENS) | frozenset(SCALES) | {'point'}
+_LITERAL_WORDS = frozenset(UNITS) | frozenset(TENS)
+_SYMBOLS = frozenset(['+', '-', '*', '/', '%', '(', ')', '**'])
+_THOUSANDS = re.compile(r'(?<=\d),(?=\d{3}\b)')
+_HAS_LETTERS = re.compile(r'[a-zA-Z]')
+
+
+def _words_to_number(words):
+    """Convert ['one', 'hundred', 'and', 'five'] (or digits mixed in) to a number"""
+    total = 0
+    current = 0
+    decimals = None
+    for word in words:
+        if decimals is not None:
+            if word.isdigit():
+                decimals += word
+                continue
+            digit = UNITS.get(word)
+            if digit is None or digit > 9:
+                raise CalculationError("I can't read the number after 'point'.")
+            decimals += str(digit)
+        elif word == 'point':
+            decimals = ''
+        elif word in UNITS:
+            current += UNITS[word]
+        elif word in TENS:
+            current += TENS[word]
+        elif word == 'hundred':
+            current = (current or 1) * 100
+        elif word in SCALES:
+            total += (current or 1) * SCALES[word]
+            current = 0
+        else:
+            current += float(word) if '.' in word else int(word)
+
+    number = total + current
+    if decimals:
+        return f"{number}.{decimals}"
+    return str(number)
+
+
+def translate_spoken(text):
+    """Turn "fifteen times twenty seven" into "15 * 27"; symbols pass through"""
+    return " ".join(_spoken_tokens(text))
+
+
+def _spoken_tokens(text):
+    """translate_spoken() as a token list the calculator can parse without splitting it again"""
+    output = []
+    number = []
+    for phrase, token in _SPOKEN_TOKEN.findall(text.lower()):
+        if phrase:
+            token = OPERATOR_PHRASES[phrase.split(None, 1)[0]]
+        numeric = token[0].isdigit()
+        if numeric or token in _NUMBER_PARTS:
+            # "5 5" and "7 eleven" stay two literals (a syntax error), they are not summed
+            if number and number[-1] != 'point' and (numeric or token in _LITERAL_WORDS) \
+                    and (numeric or number[-1][0].isdigit()):
+                output.append(_words_to_number(number))
+                number = []
+            number.append(token)
+            continue
+        if token == 'and' and number:
+            continue  # "one hundred and five"
+        if number:
+            output.append(_words_to_number(number))
+            number = []
+
+        if token in _SYMBOLS:
+            output.append(token)
+        elif token in OPERATOR_WORDS:
+            output.extend(OPERATOR_WORDS[token].split())
+        elif token == '^':
+            output.append('**')
+        elif token in FILLER_WORDS or token in ('to', 'of'):
+            continue
+        else:
+            raise CalculationError(f"I don't know how to calculate '{token}'.")
+
+    if number:
+        output.append(_words_to_number(number))
+    return output
+
+
+class SafeCalculator:
+    """
+    Evaluate arithmetic with an operator-precedence parser, never eval()
+    Python's precedence (** binds tightest and right to left, then unary signs, then
+    * / // %, then + -) with caps on magnitude, exponent and nesting
+    """
+
+    MAX_LENGTH = 200
+    MAX_MAGNITUDE = 10 ** 15
+    MAX_EXPONENT = 64
+    MAX_DEPTH = 32
+
+    _PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2, '//': 2, '%': 2, 'neg': 3, 'pos': 3, '**': 4}
+    _BINARY = {
+        '+': operator.add,
+        '-': operator.sub,
+        '*': operator.mul,
+        '/': operator.truediv,
+        '//': operator.floordiv,
+        '%': operator.mod,
+    }
+
+    def __init__(self, cache_size=1024):
+        # Repeated questions skip translation, parsing and evaluation entirely
+        self.calculate = lru_cache(maxsize=cache_size)(self._calculate)
+
+    def _calculate(self, expression):
+        """Translate spoken words, then parse and evaluate the tokens in one pass"""
+        if ',' in expression:
+            expression = _THOUSANDS.sub('', expression)
+        tokens = None
+        if _HAS_LETTERS.search(expression):
+            tokens = _spoken_tokens(expression)
+            expression = " ".join(tokens)
+        expression = expression.strip()
+        if not expression:
+            raise CalculationError("Please provide a valid mathematical expression.")
+        if len(expression) > self.MAX_LENGTH:
+            raise CalculationError("Expression too long for calculation.")
+
+        if tokens is None:
+            tokens = _SYMBOL_TOKEN.findall(expression.replace('^', '**'))
+        return self._evaluate(tokens)
+
+    def _evaluate(self, tokens):
+        """Shunting-yard over the tokens, applying each operator as soon as both sides are known"""
+        precedences = self._PRECEDENCE
+        binary = self._BINARY
+        limit = self.MAX_MAGNITUDE
+        values = []
+        pending = []
+
+        def apply(op):
+            if op == 'neg':
+                values[-1] = -values[-1]
+            elif op == '**':
+                exponent = values.pop()
+                self._check_power(values[-1], exponent)
+                values[-1] = self._check(values[-1] ** exponent)
+            elif op != 'pos':
+                right = values.pop()
+                value = binary[op](values[-1], right)
+                # Operands are at most MAX_MAGNITUDE, so these can't reach inf, nan or complex
+                if value > limit or value < -limit:
+                    raise CalculationError("That number is too large for me to calculate.")
+                values[-1] = value
+
+        expect_operand = True
+        for token in tokens:
+            if expect_operand:
+                if token[0].isdigit() or (token[0] == '.' and len(token) > 1):
+                    value = float(token) if '.' in token else int(token)
+                    if value > limit:
+                        raise CalculationError("That number is too large for me to calculate.")
+                    values.append(value)
+                    expect_operand = False
+                elif token == '(':
+                    pending.append(token)
+                elif token == '-':
+                    pending.append('neg')
+                elif token == '+':
+                    pending.append('pos')
+                else:
+                    raise SyntaxError("invalid expression")
+                if len(pending) > self.MAX_DEPTH:
+                    raise CalculationError("Expression too long for calculation.")
+            elif token == ')':
+                while pending and pending[-1] != '(':
+                    apply(pending.pop())
+                if not pending:
+                    raise SyntaxError("unbalanced brackets")
+                pending.pop()
+            elif token in precedences:
+                precedence = precedences[token]
+                # ** groups right to left, everything else left to right
+                while pending and pending[-1] != '(' and (
+                        precedences[pending[-1]] > precedence
+                        or (precedences[pending[-1]] == precedence and token != '**')):
+                    apply(pending.pop())
+                pending.append(token)
+                expect_operand = True
+            else:
+                raise SyntaxError("invalid expression")
+
+        if expect_operand:
+            raise SyntaxError("invalid expression")
+        while pending:
+            op = pending.pop()
+            if op == '(':
+                raise SyntaxError("unbalanced brackets")
+            apply(op)
+        return values[0]
+
+    def _check(self, value):
+        if isinstance(value, complex) or (isinstance(value, float) and not math.isfinite(value)):
+            raise CalculationError("That result isn't a real number I can say.")
+        if abs(value) > self.MAX_MAGNITUDE:
+            raise CalculationError("That number is too large for me to calculate.")
+        return value
+
+    def _check_power(self, base, exponent):
+        """Refuse powers whose result would blow past MAX_MAGNITUDE before computing them"""
+        if abs(exponent) > self.MAX_EXPONENT:
+            raise CalculationError("That exponent is too large for me to calculate.")
+        if abs(base) > 1 and exponent > 0:
+            if exponent * math.log10(abs(base)) > math.log10(self.MAX_MAGNITUDE):
+                raise CalculationError("That number is too large for me to calculate.")
+        if base == 0 and exponent < 0:
+            raise ZeroDivisionError("0 cannot be raised to a negative power")
+
+
+def format_result(value):
+    """Speakable number: 5.0 -> 5, long floats rounded"""
+    if isinstance(value, float):
+        if value.is_integer():
+            return str(int(value))
+        return f"{value:.10g}"
+    return str(value)
+
+
+# Test function
+def test_calculator():
+    """Test calculator"""
+    print("\n" + "=" * 60)
+    print("TESTING CALCULATOR")
+    print("=" * 60)
+
+    calculator = SafeCalculator()
+    tests = [
+        "15 * 3 + 7",
+        "15 times 27",
+        "fifteen times twenty seven",
+        "one hundred and five divided by five",
+        "two to the power of ten",
+        "three point five squared",
+        "(3 + 4) * 2",
+        "1,000 + 1",
+        "7 eleven",
+        "9**9**9**9",
+        "10 / 0",
+        "__import__('os')",
+    ]
+
+    for i, expression in enumerate(tests, 1):
+        try:
+            result = format_result(calculator.calculate(expression))
+        except (CalculationError, SyntaxError, ZeroDivisionError) as e:
+            result = f"{type(e).__name__}: {e}"
+        print(f"{i}. {expression!r} -> {result}")
+
+    print("\n" + "=" * 60)
+    print("Calculator test complete!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_calculator()
@@ -1,32 +1,52 @@
 import re
 import random
+from calculator import EXPRESSION_PATTERN, CalculationError, SafeCalculator, format_result
+from tracing import tracer
+
+
+class SessionState:
+    """Per-conversation state, kept off the processor so one processor can serve many sessions"""
+
+    def __init__(self, user_name="Friend"):
+        self.user_name = user_name
 
 
 class CommandProcessor:
     def __init__(self, internet_search):
         self.internet = internet_search
-        self.user_name = "Friend"
+        # Used when process_command is called without a session (the local voice loop)
+        self.session = SessionState()
         self.assistant_name = "Niley"
 
-        # Command patterns with regex
+        # Command patterns with regex (named groups are extracted as slots)
         self.patterns = {
-            'greeting': r'(hello|hi|hey|good morning|good afternoon|good evening)\s*(niley)?',
-            'time': r'(what(?:[\'’]s|\s+is)\s+the\s+time|current\s+time|time\s+now|tell\s+me\s+the\s+time)',
-            'date': r'(what(?:[\'’]s|\s+is)\s+the\s+date|today(?:[\'’]s)?\s+date|current\s+date)',
-            'weather': r'(weather|temperature|forecast|rain|sunny|cloudy)',
-            'news': r'(news|headlines|current\s+events|what(?:[\'’]s|\s+is)\s+happening)',
-            'search': r'(search\s+for|look\s+up|what\s+is|who\s+is|where\s+is|tell\s+me\s+about|explain)',
-            'joke': r'(tell\s+(?:me\s+)?a\s+joke|make\s+me\s+laugh|joke)',
-            'name': r'(my\s+name\s+is|call\s+me|i(?:\'m| am)\s+called|i(?:\'m| am)\s+)([\w\s]+)',
-            'thank': r'(thank\s+you|thanks|appreciate|grateful)',
-            'how_are_you': r'(how\s+are\s+you|how\s+do\s+you\s+feel|are\s+you\s+ok)',
-            'capabilities': r'(what\s+can\s+you\s+do|your\s+abilities|capabilities|features|help)',
-            'calculate': r'(calculate|what\s+is|solve)\s+([\d+\-*/().\s]+)',
-            'stop': r'(stop|exit|quit|goodbye|bye|see\s+you)',
-            'love': r'(love\s+you|like\s+you|adore\s+you)',
-            'creator': r'(who\s+made\s+you|who\s+created\s+you|your\s+creator|who\s+built\s+you)',
+            'greeting': r'(?:hello|hi|hey|good morning|good afternoon|good evening)\s*(?:niley)?',
+            'time': r'(?:what(?:[\'’]s|\s+is)\s+the\s+time|current\s+time|time\s+now|tell\s+me\s+the\s+time)',
+            'date': r'(?:what(?:[\'’]s|\s+is)\s+the\s+date|today(?:[\'’]s)?\s+date|current\s+date)',
+            'weather': r'(?:weather|temperature|forecast|rain|sunny|cloudy)',
+            'news': r'(?:news|headlines|current\s+events|what(?:[\'’]s|\s+is)\s+happening)',
+            'search': r'(?:search\s+for|look\s+up|what\s+is|who\s+is|where\s+is|tell\s+me\s+about|explain)',
+            'joke': r'(?:tell\s+(?:me\s+)?a\s+joke|make\s+me\s+laugh|joke)',
+            'name': r'(?:my\s+name\s+is|call\s+me|i(?:\'m| am)\s+called|i(?:\'m| am)\s+)(?P<user_name>[\w\s]+)',
+            'thank': r'(?:thank\s+you|thanks|appreciate|grateful)',
+            'how_are_you': r'(?:how\s+are\s+you|how\s+do\s+you\s+feel|are\s+you\s+ok)',
+            'capabilities': r'(?:what\s+can\s+you\s+do|your\s+abilities|capabilities|features|help)',
+            # Only when everything after the trigger is arithmetic, so numeric searches stay searches;
+            # the expression is a flat run with one way to split it, so the $ anchor can't backtrack
+            'calculate': r'(?:calculate|what\s+is|solve)\s+(?P<expression>' + EXPRESSION_PATTERN + r')[\s?.!]*$',
+            'stop': r'(?:stop|exit|quit|goodbye|bye|see\s+you)',
+            'love': r'(?:love\s+you|like\s+you|adore\s+you)',
+            'creator': r'(?:who\s+made\s+you|who\s+created\s+you|your\s+creator|who\s+built\s+you)',
         }
 
+        # Which intent wins when several match (first wins)
+        self.priorities = [
+            'greeting', 'time', 'date', 'weather', 'news', 'calculate', 'search', 'joke',
+            'name', 'thank', 'how_are_you', 'capabilities', 'stop', 'love', 'creator',
+        ]
+
+        self._compile_patterns()
+
         # Responses for different situations
         self.responses = {
             'greeting': [
@@ -91,21 +111,40 @@ class CommandProcessor:
             ]
         }
 
+    def _compile_patterns(self):
+        """Compile all intent and slot regexes once"""
+        # One lookahead branch per intent, in priority order, so a single
+        # match() call returns the highest-priority intent and its slots.
+        branches = []
+        for pattern_type in self.priorities:
+            pattern = self.patterns[pattern_type]
+            branches.append(f"(?=.*?(?P<{pattern_type}>{pattern}))")
+        self._intent_regex = re.compile('|'.join(branches), re.IGNORECASE | re.DOTALL)
+
+        self._city_regex = re.compile(
+            r'(?:weather\s+(?:in|at|for)|temperature\s+in|forecast\s+for)\s+(\w+(?:\s+\w+)*)',
+            re.IGNORECASE
+        )
+        self._search_words_regex = re.compile(
+            r'search\s+for|look\s+up|what\s+is|who\s+is|where\s+is|tell\s+me\s+about|explain',
+            re.IGNORECASE
+        )
+        self._calculation_regex = re.compile(self.patterns['calculate'], re.IGNORECASE)
+        self._non_math_regex = re.compile(r'[^\d+\-*/().]')
+
+    @property
+    def user_name(self):
+        return self.session.user_name
+
+    @user_name.setter
+    def user_name(self, value):
+        self.session.user_name = value
+
     def extract_city(self, command):
         """Extract city name from weather command"""
-        # Common patterns for city extraction
-        patterns = [
-            r'weather in (\w+(?:\s+\w+)*)',
-            r'weather at (\w+(?:\s+\w+)*)',
-            r'weather for (\w+(?:\s+\w+)*)',
-            r'temperature in (\w+(?:\s+\w+)*)',
-            r'forecast for (\w+(?:\s+\w+)*)',
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, command, re.IGNORECASE)
-            if match:
-                return match.group(1).strip()
+        match = self._city_regex.search(command)
+        if match:
+            return match.group(1).strip()
 
         # If no city mentioned, return None
         return None
@@ -113,122 +152,139 @@ class CommandProcessor:
     def extract_search_query(self, command):
         """Extract search query from command"""
         # Remove command words
-        patterns_to_remove = [
-            r'search for',
-            r'look up',
-            r'what is',
-            r'who is',
-            r'where is',
-            r'tell me about',
-            r'explain',
-        ]
-
-        for pattern in patterns_to_remove:
-            command = re.sub(pattern, '', command, flags=re.IGNORECASE)
-
-        return command.strip()
+        return self._search_words_regex.sub('', command).strip()
 
     def extract_calculation(self, command):
         """Extract calculation expression"""
-        patterns = [
-            r'calculate\s+([\d+\-*/().\s]+)',
-            r'what is\s+([\d+\-*/().\s]+)',
-            r'solve\s+([\d+\-*/().\s]+)',
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, command, re.IGNORECASE)
-            if match:
-                return match.group(1).strip()
+        match = self._calculation_regex.search(command)
+        if match:
+            return match.group('expression').strip()
 
         # If no pattern matches, try to extract numbers and operators
-        math_expr = re.sub(r'[^\d+\-*/().]', '', command)
+        math_expr = self._non_math_regex.sub('', command)
         return math_expr if math_expr else None
 
-    def process_command(self, command):
+    def match_intent(self, command):
+        """
+        Match a command against all intents with one compiled regex
+        Returns (intent, slots), or (None, {}) if nothing matched
+        """
+        if not command or not command.strip():
+            return None, {}
+
+        command_lower = command.lower().strip()
+        match = self._intent_regex.match(command_lower)
+        if not match:
+            return None, {}
+
+        groups = match.groupdict()
+        for pattern_type in self.priorities:
+            if groups[pattern_type] is None:
+                continue
+
+            slots = {}
+            if pattern_type == 'weather':
+                slots['city'] = self.extract_city(command_lower)
+            elif pattern_type == 'search':
+                slots['query'] = self.extract_search_query(command_lower)
+            elif pattern_type == 'name':
+                slots['user_name'] = groups['user_name'].strip()
+            elif pattern_type == 'calculate':
+                slots['expression'] = groups['expression'].strip()
+            return pattern_type, slots
+
+        return None, {}
+
+    def process_command(self, command, session=None):
         """Process voice command and return appropriate response"""
         if not command or len(command.strip()) == 0:
             return None
 
         command_lower = command.lower().strip()
-
-        # Check each pattern
-        for pattern_type, pattern in self.patterns.items():
-            match = re.search(pattern, command_lower, re.IGNORECASE)
-            if match:
-
-                # GREETING
-                if pattern_type == 'greeting':
-                    return random.choice(self.responses['greeting'])
-
-                # TIME
-                elif pattern_type == 'time':
-                    return self.internet.get_time_date()
-
-                # DATE
-                elif pattern_type == 'date':
-                    return self.internet.get_time_date()
-
-                # WEATHER
-                elif pattern_type == 'weather':
-                    city = self.extract_city(command_lower)
-                    if city:
-                        return self.internet.get_weather_basic(city)
-                    else:
-                        return self.internet.get_weather_basic("your location")
-
-                # NEWS
-                elif pattern_type == 'news':
-                    return self.internet.get_news_basic()
-
-                # SEARCH
-                elif pattern_type == 'search':
-                    query = self.extract_search_query(command_lower)
-                    if query:
-                        return self.internet.search_web_simple(query)
-                    else:
-                        return "What would you like me to search for?"
-
-                # JOKE
-                elif pattern_type == 'joke':
-                    return self.internet.get_joke()
-
-                # NAME
-                elif pattern_type == 'name' and len(match.groups()) > 1:
-                    self.user_name = match.group(2).strip()
-                    return f"Nice to meet you, {self.user_name}! I'm {self.assistant_name}. How can I help you today?"
-
-                # THANK
-                elif pattern_type == 'thank':
-                    return random.choice(self.responses['thank'])
-
-                # HOW ARE YOU
-                elif pattern_type == 'how_are_you':
-                    return random.choice(self.responses['how_are_you'])
-
-                # CAPABILITIES
-                elif pattern_type == 'capabilities':
-                    return random.choice(self.responses['capabilities'])
-
-                # CALCULATE
-                elif pattern_type == 'calculate' and len(match.groups()) > 1:
-                    expression = match.group(2).strip()
-                    if expression:
-                        return self.internet.calculate(expression)
-                    else:
-                        return "Please tell me what to calculate."
-
-                # STOP
-                elif pattern_type == 'stop':
-                    return "STOP_COMMAND"  # Special signal to stop
-
-                # LOVE
-                elif pattern_type == 'love':
-                    return random.choice(self.responses['love'])
-
-                # CREATOR
-                elif pattern_type == 'creator':
-                    return random.choice(self.responses['creator'])
+        with tracer.span('intent') as span:
+            pattern_type, slots = self.match_intent(command_lower)
+            span.set(intent=pattern_type)
+        return self.respond(pattern_type, slots, command_lower, session)
+
+    def respond(self, pattern_type, slots, command_lower, session=None):
+        """
+        Answer an intent already found by match_intent, so callers that need the intent
+        first (to route or report it) don't match the command a second time
+        """
+        session = session or self.session
+
+        # GREETING
+        if pattern_type == 'greeting':
+            return random.choice(self.responses['greeting'])
+
+        # TIME
+        elif pattern_type == 'time':
+            return self.internet.get_time_date()
+
+        # DATE
+        elif pattern_type == 'date':
+            return self.internet.get_time_date()
+
+        # WEATHER
+        elif pattern_type == 'weather':
+            city = slots['city']
+            if city:
+                return self.internet.get_weather_basic(city)
+            else:
+                return self.internet.get_weather_basic("your location")
+
+        # NEWS
+        elif pattern_type == 'news':
+            return self.internet.get_news_basic()
+
+        # SEARCH
+        elif pattern_type == 'search':
+            query = slots['query']
+            if query:
+                return self.internet.search_web_simple(query)
+            else:
+                return "What would you like me to search for?"
+
+        # JOKE
+        elif pattern_type == 'joke':
+            return self.internet.get_joke()
+
+        # NAME
+        elif pattern_type == 'name':
+            session.user_name = slots['user_name']
+            return f"Nice to meet you, {session.user_name}! I'm {self.assistant_name}. How can I help you today?"
+
+        # THANK
+        elif pattern_type == 'thank':
+            return random.choice(self.responses['thank'])
+
+        # HOW ARE YOU
+        elif pattern_type == 'how_are_you':
+            return random.choice(self.responses['how_are_you'])
+
+        # CAPABILITIES
+        elif pattern_type == 'capabilities':
+            return random.choice(self.responses['capabilities'])
+
+        # CALCULATE
+        elif pattern_type == 'calculate':
+            expression = slots['expression']
+            if expression:
+                return self.internet.calculate(expression)
+            else:
+                return "Please tell me what to calculate."
+
+        # STOP
+        elif pattern_type == 'stop':
+            return "STOP_COMMAND"  # Special signal to stop
+
+        # LOVE
+        elif pattern_type == 'love':
+            return random.choice(self.responses['love'])
+
+        # CREATOR
+        elif pattern_type == 'creator':
+            return random.choice(self.responses['creator'])
 
         # If no pattern matches, try a web search
         if len(command_lower.split()) > 2:  # If it's more than 2 words, probably a search
@@ -259,11 +315,15 @@ def test_command_processor():
             return f"Search results for {query}"
 
         def calculate(self, expr):
-            return f"Result: {eval(expr)}"
+            try:
+                return f"Result: {format_result(calculator.calculate(expr))}"
+            except (CalculationError, SyntaxError, ZeroDivisionError) as e:
+                return f"Cannot calculate: {e}"
 
         def get_joke(self):
             return "Why did the computer go to therapy? It had too many bytes of emotional baggage!"
 
+    calculator = SafeCalculator()
     internet = MockInternetSearch()
     processor = CommandProcessor(internet)
 
@@ -276,6 +336,10 @@ def test_command_processor():
         "tell me the news",
         "search for artificial intelligence",
         "calculate 15 + 20",
+        "what is 5 + 5",
+        "what is fifteen times twenty seven",
+        "what is the 3 body problem",
+        "what is " + "1 + " * 18 + "foo",
         "tell me a joke",
         "my name is Alex",
         "thank you",
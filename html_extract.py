@@ -0,0 +1,240 @@
+import codecs
+from html.parser import HTMLParser
+
+
+# Elements that never have an end tag, so they don't change nesting depth
+VOID_TAGS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+    'param', 'source', 'track', 'wbr',
+])
+# Block elements that implicitly close an open <p>
+P_CLOSERS = frozenset([
+    'p', 'div', 'table', 'ul', 'ol', 'dl', 'pre', 'blockquote', 'section', 'h1', 'h2',
+    'h3', 'h4', 'h5', 'h6', 'hr', 'form', 'figure',
+])
+
+
+class TargetedExtractor(HTMLParser):
+    """
+    Collect the text of the first element(s) we care about and stop
+    Nothing else is kept: no tree is built, and `done` tells the caller it can stop feeding
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.done = False
+        self._skip_depth = 0  # inside <script>/<style>
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'style'):
+            self._skip_depth += 1
+        elif not self.done:
+            self.on_start(tag, attrs)
+
+    def handle_startendtag(self, tag, attrs):
+        if not self.done and tag not in ('script', 'style'):
+            self.on_start(tag, attrs)
+            if tag not in VOID_TAGS:
+                self.on_end(tag)
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style'):
+            self._skip_depth = max(self._skip_depth - 1, 0)
+        elif not self.done:
+            self.on_end(tag)
+
+    def handle_data(self, data):
+        if not self.done and not self._skip_depth:
+            self.on_data(data)
+
+    def on_start(self, tag, attrs):
+        pass
+
+    def on_end(self, tag):
+        pass
+
+    def on_data(self, data):
+        pass
+
+    @staticmethod
+    def has_class(attrs, class_name):
+        for name, value in attrs:
+            if name == 'class' and value and class_name in value.split():
+                return True
+        return False
+
+
+class _Capture:
+    """Text of one element, tracking depth so nested tags don't end it early"""
+
+    def __init__(self, tag):
+        self.tag = tag
+        self.depth = 1
+        self.parts = []
+
+    def start(self, tag):
+        if tag not in VOID_TAGS:
+            self.depth += 1
+
+    def end(self, tag):
+        """True when this end tag closes the captured element"""
+        if tag in VOID_TAGS:
+            return False
+        self.depth -= 1
+        return self.depth <= 0
+
+    @property
+    def text(self):
+        return ''.join(self.parts)
+
+
+class DuckDuckGoExtractor(TargetedExtractor):
+    """First result__snippet div, plus the first result__url link as a fallback"""
+
+    def __init__(self, snippet_tag='div'):
+        super().__init__()
+        self.snippet_tag = snippet_tag
+        self.snippet = None
+        self.result_url = None  # (text, href)
+
+        self._snippet = None
+        self._url = None
+        self._url_href = None
+
+    def on_start(self, tag, attrs):
+        for capture in (self._snippet, self._url):
+            if capture:
+                capture.start(tag)
+
+        if self.snippet is None and self._snippet is None and tag == self.snippet_tag \
+                and self.has_class(attrs, 'result__snippet'):
+            self._snippet = _Capture(tag)
+        elif self.result_url is None and self._url is None and tag == 'a' \
+                and self.has_class(attrs, 'result__url'):
+            self._url = _Capture(tag)
+            self._url_href = dict(attrs).get('href')
+
+    def on_end(self, tag):
+        if self._snippet and self._snippet.end(tag):
+            self.snippet = self._snippet.text
+            self._snippet = None
+            # The snippet is the answer; the result link only matters without one
+            self.done = True
+        if self._url and self._url.end(tag):
+            self.result_url = (self._url.text, self._url_href)
+            self._url = None
+
+    def on_data(self, data):
+        for capture in (self._snippet, self._url):
+            if capture:
+                capture.parts.append(data)
+
+
+class ParagraphExtractor(TargetedExtractor):
+    """First <p> whose text is longer than min_length characters"""
+
+    def __init__(self, min_length=50):
+        super().__init__()
+        self.min_length = min_length
+        self.paragraph = None
+        self._capture = None
+
+    def on_start(self, tag, attrs):
+        if self._capture and tag in P_CLOSERS:
+            self._finish()
+        if self.done:
+            return
+        if self._capture:
+            self._capture.start(tag)
+        elif tag == 'p':
+            self._capture = _Capture(tag)
+
+    def on_end(self, tag):
+        if self._capture and self._capture.end(tag):
+            self._finish()
+
+    def on_data(self, data):
+        if self._capture:
+            self._capture.parts.append(data)
+
+    def _finish(self):
+        text = self._capture.text
+        self._capture = None
+        if text.strip() and len(text) > self.min_length:
+            self.paragraph = text
+            self.done = True
+
+    def close(self):
+        super().close()
+        if self._capture and not self.done:
+            self._finish()
+
+
+def feed_until_done(parser, chunks, encoding='utf-8'):
+    """
+    Feed text or byte chunks into parser until it has its answer
+    Returns the number of input bytes/characters consumed
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    consumed = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        consumed += len(chunk)
+        parser.feed(decoder.decode(chunk) if isinstance(chunk, bytes) else chunk)
+        if parser.done:
+            return consumed
+    parser.close()
+    return consumed
+
+
+def extract_from_response(response, parser, chunk_size=16 * 1024):
+    """
+    Stream a requests response (made with stream=True) through parser
+    The body is closed as soon as the parser is done, so the rest is never downloaded
+    (the connection is then dropped from the pool instead of reused)
+    """
+    try:
+        encoding = response.encoding or 'utf-8'
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            encoding = 'utf-8'
+        return feed_until_done(parser, response.iter_content(chunk_size=chunk_size), encoding)
+    finally:
+        response.close()
+
+
+# Test function
+def test_html_extract():
+    """Test targeted extraction on small inline pages"""
+    print("\n" + "=" * 60)
+    print("TESTING HTML EXTRACTION")
+    print("=" * 60)
+
+    results_page = (
+        '<html><head><script>var x = "<div class=result__snippet>";</script></head><body>'
+        '<a class="result__url" href="https://en.wikipedia.org/wiki/Python"> en.wikipedia.org </a>'
+        '<div class="result result__body"><div class="result__snippet">Python is a '
+        '<b>programming</b> language &amp; more.</div></div>'
+        + '<div class="result">filler</div>' * 1000 + '</body></html>'
+    )
+    extractor = DuckDuckGoExtractor()
+    consumed = feed_until_done(extractor, (results_page[i:i + 512] for i in range(0, len(results_page), 512)))
+    print(f"\n1. Snippet: {extractor.snippet!r}")
+    print(f"2. Result URL: {extractor.result_url}")
+    print(f"3. Parsed {consumed} of {len(results_page)} characters")
+
+    article = ('<html><body><p>Short.</p><p>Python is a high-level, general-purpose programming '
+               'language. Its design philosophy emphasizes code readability.<p>Second</body></html>')
+    extractor = ParagraphExtractor()
+    feed_until_done(extractor, [article])
+    print(f"4. Paragraph: {extractor.paragraph!r}")
+
+    print("\n" + "=" * 60)
+    print("HTML extraction test complete!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_html_extract()
@@ -1,12 +1,146 @@
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib.parse import urlsplit
 from datetime import datetime
+import os
 import re
 import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from calculator import SafeCalculator, CalculationError, format_result
+from html_extract import DuckDuckGoExtractor, ParagraphExtractor, extract_from_response
+from location import LocationResolver
+from response_cache import ResponseCache
+from tracing import tracer
+
+
+class HttpSessionPool:
+    """Keep-alive HTTP sessions, one per host, with bounded retries for GETs"""
+
+    # (connect, read) timeouts in seconds, matched on host suffix
+    DEFAULT_TIMEOUTS = {
+        'duckduckgo.com': (3.05, 8),
+        'wikipedia.org': (3.05, 8),
+        'wttr.in': (3.05, 5),
+        'ipinfo.io': (2, 5),
+        'reddit.com': (3.05, 8),
+    }
+
+    def __init__(self, headers=None, pool_connections=2, pool_maxsize=4, max_retries=2,
+                 backoff_factor=0.3, timeouts=None, default_timeout=(3.05, 8)):
+        self.headers = headers or {}
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.timeouts = dict(self.DEFAULT_TIMEOUTS)
+        if timeouts:
+            self.timeouts.update(timeouts)
+        self.default_timeout = default_timeout
+
+        self._sessions = {}  # host -> requests.Session
+        self._counters = {}  # host -> {'requests', 'errors', 'total_ms'}
+        self._lock = threading.Lock()
+
+    def _make_session(self):
+        # Read timeouts are not retried, so a slow host costs one timeout, not several
+        retry = Retry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            read=False,
+            status=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.headers.update(self.headers)
+        session.headers['Connection'] = 'keep-alive'
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def _session_for(self, host):
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._make_session()
+                self._sessions[host] = session
+                self._counters[host] = {'requests': 0, 'errors': 0, 'total_ms': 0.0}
+            return session
+
+    def timeout_for(self, host):
+        """Return the (connect, read) timeout configured for a host"""
+        for suffix, timeout in self.timeouts.items():
+            if host == suffix or host.endswith('.' + suffix):
+                return timeout
+        return self.default_timeout
+
+    def get(self, url, timeout=None, **kwargs):
+        """GET through the pooled session for the URL's host"""
+        host = urlsplit(url).hostname or ''
+        session = self._session_for(host)
+        if timeout is None:
+            timeout = self.timeout_for(host)
+
+        start = time.perf_counter()
+        try:
+            with tracer.span('fetch', host=host):
+                return session.get(url, timeout=timeout, **kwargs)
+        except requests.exceptions.RequestException:
+            with self._lock:
+                self._counters[host]['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                counters = self._counters[host]
+                counters['requests'] += 1
+                counters['total_ms'] += (time.perf_counter() - start) * 1000
+
+    def stats(self):
+        """Per-host request counts and how many requests reused a connection"""
+        with self._lock:
+            report = {}
+            for host, session in self._sessions.items():
+                counters = self._counters[host]
+                opened = 0
+                served = 0
+                for adapter in set(session.adapters.values()):
+                    pools = adapter.poolmanager.pools
+                    for key in pools.keys():
+                        pool = pools[key]
+                        opened += pool.num_connections
+                        served += pool.num_requests
+                report[host] = {
+                    'requests': counters['requests'],
+                    'errors': counters['errors'],
+                    'connections_opened': opened,
+                    'connections_reused': max(served - opened, 0),
+                    'avg_ms': counters['total_ms'] / counters['requests'] if counters['requests'] else 0.0,
+                }
+            return report
+
+    def close(self):
+        """Close all pooled connections"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
 
 
 class InternetSearch:
-    def __init__(self):
+    def __init__(self, pool_connections=2, pool_maxsize=4, max_retries=2, timeouts=None,
+                 cache_ttls=None, cache_size=256, persist_cache=False,
+                 search_providers=None, search_deadline=8, max_recent_cities=5, home_location=None,
+                 search_workers=4):
         # We'll add API keys later
         self.wolfram_app_id = None
         self.weather_api_key = None
@@ -16,8 +150,67 @@ class InternetSearch:
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         }
 
+        # Reuse TCP/TLS connections across questions
+        self.http = HttpSessionPool(
+            headers=self.headers,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=max_retries,
+            timeouts=timeouts,
+        )
+
+        # Answer repeated questions without touching the network
+        cache_path = None
+        if persist_cache:
+            cache_path = os.path.join(os.path.expanduser("~"), ".niley", "responses.json")
+        self.cache = ResponseCache(ttls=cache_ttls, max_entries=cache_size, persist_path=cache_path)
+
+        # Search sources run in parallel; extra providers are callables query -> answer or None
+        self.search_providers = list(search_providers or [])
+        self.search_deadline = search_deadline
+        self.search_workers = search_workers
+        self._executor = ThreadPoolExecutor(max_workers=search_workers, thread_name_prefix="search")
+
+        # Memoized, bounded-cost arithmetic for calculate()
+        self.calculator = SafeCalculator()
+
+        # Home city for weather without a city: NILEY_LOCATION, else a cached IP lookup
+        self.location = LocationResolver(
+            self.http,
+            static_location=home_location or os.environ.get("NILEY_LOCATION"),
+        )
+        self.location.refresh_async()
+
+        # Cities asked about recently, newest last (the prefetcher keeps their weather warm)
+        self.max_recent_cities = max_recent_cities
+        self._recent_cities = OrderedDict()
+        self._recent_lock = threading.Lock()
+
         print("🌐 Internet search module initialized")
 
+    def recent_cities(self):
+        """Cities asked about recently, most recent first"""
+        with self._recent_lock:
+            return list(reversed(self._recent_cities.values()))
+
+    def _remember_city(self, city):
+        key = ResponseCache.normalize(city)
+        with self._recent_lock:
+            self._recent_cities.pop(key, None)
+            self._recent_cities[key] = city
+            while len(self._recent_cities) > self.max_recent_cities:
+                self._recent_cities.popitem(last=False)
+
+    def connection_stats(self):
+        """Per-host HTTP stats, including connection reuse"""
+        return self.http.stats()
+
+    def close(self):
+        """Release pooled connections and persist cached answers"""
+        self.cache.save()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.http.close()
+
     def get_time_date(self):
         """Get current time and date"""
         now = datetime.now()
@@ -29,36 +222,9 @@ class InternetSearch:
     def search_web_simple(self, query):
         """Simple web search using DuckDuckGo"""
         try:
-            print(f"🔍 Searching for: {query}")
-            # Clean the query
-            clean_query = requests.utils.quote(query)
-            search_url = f"https://duckduckgo.com/html/?q={clean_query}"
-
-            response = requests.get(search_url, headers=self.headers, timeout=8)
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # Try to find instant answer
-            answer = soup.find('div', class_='result__snippet')
+            answer = self.cache.get_or_fetch('search', query, lambda: self._fetch_search(query))
             if answer:
-                text = answer.get_text()[:250]
-                return f"According to web search: {text}"
-
-            # Alternative: look for Wikipedia result
-            wikipedia_result = soup.find('a', class_='result__url')
-            if wikipedia_result and 'wikipedia' in wikipedia_result.text.lower():
-                # Try to get Wikipedia summary directly
-                try:
-                    wiki_url = wikipedia_result['href']
-                    wiki_response = requests.get(wiki_url, headers=self.headers, timeout=8)
-                    wiki_soup = BeautifulSoup(wiki_response.text, 'html.parser')
-
-                    # Find first paragraph
-                    for paragraph in wiki_soup.find_all('p'):
-                        if paragraph.text.strip() and len(paragraph.text) > 50:
-                            summary = paragraph.text[:300]
-                            return f"Wikipedia says: {summary}"
-                except:
-                    pass
+                return answer
 
             # Last resort: return simple answer
             return f"I found information about {query.split()[0]} but need more specific details. Could you rephrase your question?"
@@ -69,32 +235,127 @@ class InternetSearch:
             print(f"Search error: {e}")
             return "I'm having trouble searching right now. Please try again later."
 
+    @property
+    def search_capacity(self):
+        """Searches that can run at once without queueing: each holds a worker and a connection per source"""
+        sources = 2 + len(self.search_providers)
+        return max(min(self.search_workers // sources, self.http.pool_maxsize), 1)
+
+    def _fetch_search(self, query):
+        """Race all search sources under one deadline, return the first good answer"""
+        print(f"🔍 Searching for: {query}")
+
+        cancelled = threading.Event()
+        futures = [
+            self._executor.submit(tracer.bind(self._search_duckduckgo), query, cancelled),
+            self._executor.submit(tracer.bind(self._search_wikipedia), query, cancelled),
+        ]
+        for provider in self.search_providers:
+            futures.append(self._executor.submit(tracer.bind(provider), query))
+
+        errors = []
+        pending = set(futures)
+        deadline = time.monotonic() + self.search_deadline
+        try:
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        answer = future.result()
+                    except Exception as e:
+                        errors.append(e)
+                        continue
+                    if answer:
+                        return answer
+        finally:
+            # Losers stop at their next checkpoint; queued ones never start
+            cancelled.set()
+            for future in futures:
+                future.cancel()
+
+        if pending or any(isinstance(e, requests.exceptions.Timeout) for e in errors):
+            raise requests.exceptions.Timeout(f"No search answer within {self.search_deadline}s")
+        if errors and len(errors) == len(futures):
+            raise errors[0]
+        return None
+
+    def _search_duckduckgo(self, query, cancelled=None):
+        """Answer from the DuckDuckGo HTML results, or None"""
+        # Clean the query
+        clean_query = requests.utils.quote(query)
+        search_url = f"https://duckduckgo.com/html/?q={clean_query}"
+
+        # Stream the page and stop reading once the first snippet is complete
+        response = self.http.get(search_url, stream=True)
+        if cancelled and cancelled.is_set():
+            response.close()
+            return None
+        results = DuckDuckGoExtractor()
+        extract_from_response(response, results)
+
+        # Try to find instant answer
+        if results.snippet:
+            text = results.snippet[:250]
+            return f"According to web search: {text}"
+
+        # Alternative: look for Wikipedia result
+        if results.result_url and 'wikipedia' in results.result_url[0].lower():
+            if cancelled and cancelled.is_set():
+                return None
+            # Try to get Wikipedia summary directly
+            try:
+                wiki_url = results.result_url[1]
+                wiki_response = self.http.get(wiki_url, stream=True)
+
+                # Only read up to the first real paragraph
+                article = ParagraphExtractor(min_length=50)
+                extract_from_response(wiki_response, article)
+                if article.paragraph:
+                    summary = article.paragraph[:300]
+                    return f"Wikipedia says: {summary}"
+            except:
+                pass
+
+        return None
+
+    def _search_wikipedia(self, query, cancelled=None):
+        """Intro of the best matching Wikipedia article, or None"""
+        params = {
+            'action': 'query',
+            'format': 'json',
+            'generator': 'search',
+            'gsrsearch': query,
+            'gsrlimit': 1,
+            'prop': 'extracts',
+            'exintro': 1,
+            'explaintext': 1,
+            'redirects': 1,
+        }
+        response = self.http.get('https://en.wikipedia.org/w/api.php', params=params)
+        if response.status_code != 200 or (cancelled and cancelled.is_set()):
+            return None
+
+        pages = response.json().get('query', {}).get('pages', {})
+        for page in pages.values():
+            extract = page.get('extract', '').strip()
+            if len(extract) > 50:
+                return f"Wikipedia says: {extract[:300]}"
+        return None
+
     def get_weather_basic(self, city="your location"):
         """Basic weather without API (we'll enhance with API later)"""
+        if city != "your location":
+            self._remember_city(city)
         try:
-            if city == "your location":
-                try:
-                    # Try to get city from IP
-                    response = requests.get('https://ipinfo.io/city', headers=self.headers, timeout=5)
-                    if response.status_code == 200:
-                        city = response.text.strip()
-                    else:
-                        city = "London"
-                except:
-                    city = "London"
-
-            print(f"🌤️  Getting weather for: {city}")
-
-            # Alternative weather source with shorter timeout
-            url = f"https://wttr.in/{city}?format=3"
-            response = requests.get(url, headers=self.headers, timeout=5)
-
-            if response.status_code == 200:
-                weather_data = response.text.strip()
-                return f"Weather in {city}: {weather_data}"
-            else:
-                # Fallback to static message
-                return f"I can check detailed weather for {city} once we add the weather API."
+            answer = self.cache.get_or_fetch('weather', city, lambda: self._fetch_weather(city))
+            if answer:
+                return answer
+
+            # Fallback to static message
+            return f"I can check detailed weather for {city} once we add the weather API."
 
         except requests.exceptions.Timeout:
             return "Weather service is taking too long. Please try again in a moment."
@@ -102,27 +363,29 @@ class InternetSearch:
             print(f"Weather check error: {e}")
             return f"I'll have weather updates soon. For now, you can check any weather app for {city}."
 
-    def get_news_basic(self):
-        """Get basic news headlines"""
-        try:
-            print("📰 Fetching news headlines...")
+    def _fetch_weather(self, city):
+        """Fetch a weather answer, or None if the service had nothing"""
+        if city == "your location":
+            # Usually cached, so only the weather request touches the network
+            city = self.location.resolve()
 
-            # Alternative news source: Reddit worldnews (no API needed)
-            url = "https://www.reddit.com/r/worldnews/.json"
-            response = requests.get(url, headers=self.headers, timeout=8)
+        print(f"🌤️  Getting weather for: {city}")
 
-            if response.status_code == 200:
-                data = response.json()
-                articles = data['data']['children'][:5]  # Top 5 articles
+        # Alternative weather source with shorter timeout
+        url = f"https://wttr.in/{city}?format=3"
+        response = self.http.get(url)
 
-                headlines = []
-                for article in articles:
-                    title = article['data']['title'][:100]  # Limit title length
-                    headlines.append(title)
+        if response.status_code == 200:
+            weather_data = response.text.strip()
+            return f"Weather in {city}: {weather_data}"
+        return None
 
-                if headlines:
-                    news_summary = " | ".join(headlines)
-                    return f"Top world news: {news_summary}"
+    def get_news_basic(self):
+        """Get basic news headlines"""
+        try:
+            answer = self.cache.get_or_fetch('news', 'worldnews', self._fetch_news)
+            if answer:
+                return answer
 
             # Fallback to static news
             return "Today's important updates: Technology is advancing rapidly. Check news websites for latest updates."
@@ -131,25 +394,42 @@ class InternetSearch:
             print(f"News error: {e}")
             return "For the latest news, please check your favorite news website or app."
 
+    def _fetch_news(self):
+        """Fetch top headlines, or None if the source had nothing"""
+        print("📰 Fetching news headlines...")
+
+        # Alternative news source: Reddit worldnews (no API needed)
+        url = "https://www.reddit.com/r/worldnews/.json"
+        response = self.http.get(url)
+
+        if response.status_code == 200:
+            data = response.json()
+            articles = data['data']['children'][:5]  # Top 5 articles
+
+            headlines = []
+            for article in articles:
+                title = article['data']['title'][:100]  # Limit title length
+                headlines.append(title)
+
+            if headlines:
+                news_summary = " | ".join(headlines)
+                return f"Top world news: {news_summary}"
+
+        return None
+
     def calculate(self, expression):
-        """Simple calculation"""
+        """Arithmetic on typed or spoken expressions ("15 times 27"), without eval"""
         try:
-            # Clean the expression - only allow safe characters
-            safe_chars = set('0123456789+-*/.()% ')
-            clean_expr = ''.join(char for char in expression if char in safe_chars)
-
-            if not clean_expr:
+            if not expression or not expression.strip():
                 return "Please provide a valid mathematical expression."
 
-            # Additional safety check
-            if len(clean_expr) > 50:
-                return "Expression too long for calculation."
-
-            result = eval(clean_expr)
-            return f"The result is {result}"
+            result = self.calculator.calculate(expression)
+            return f"The result is {format_result(result)}"
 
         except ZeroDivisionError:
             return "Cannot divide by zero."
+        except CalculationError as e:
+            return str(e)
         except SyntaxError:
             return "Invalid mathematical expression. Please use numbers and basic operators (+, -, *, /)."
         except Exception as e:
@@ -203,12 +483,28 @@ def test_internet_search():
     print("\n5. Testing calculation...")
     calc_result = search.calculate("15 * 3 + 7")
     print(f" {calc_result}")
+    calc_result = search.calculate("fifteen times twenty seven")
+    print(f" {calc_result}")
 
     # Test 6: Joke
     print("\n6. Testing joke...")
     joke = search.get_joke()
     print(f" {joke}")
 
+    # Test 7: Connection reuse
+    print("\n7. Testing connection reuse...")
+    search.get_weather_basic("Paris")
+    for host, stats in search.connection_stats().items():
+        print(f" {host}: {stats['requests']} requests, {stats['connections_reused']} reused connections")
+
+    # Test 8: Cached answers
+    print("\n8. Testing cached answers...")
+    start = time.time()
+    search.get_weather_basic("London")
+    print(f" Repeated weather answered in {(time.time() - start) * 1000:.1f} ms")
+    print(f" Cache: {search.cache.stats()}")
+    search.close()
+
     print("\n" + "=" * 60)
     print(" Internet search module test complete!")
     print("=" * 60)
@@ -0,0 +1,133 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+DEFAULT_LOCATION_PATH = os.path.join(os.path.expanduser("~"), ".niley", "location.json")
+
+
+class LocationResolver:
+    """
+    Home city for "weather" questions without a city
+    A configured static location wins; otherwise the IP lookup is cached on disk for a long TTL
+    and refreshed in the background, so a local-weather question needs no lookup of its own
+    """
+
+    LOOKUP_URL = 'https://ipinfo.io/city'
+
+    def __init__(self, http, path=DEFAULT_LOCATION_PATH, ttl=7 * 24 * 60 * 60, static_location=None,
+                 fallback="London", retry_after=5 * 60):
+        self.http = http
+        self.path = path
+        self.ttl = ttl
+        self.static_location = static_location.strip() if static_location else None
+        self.fallback = fallback
+        # After a failed lookup, use the fallback for this long instead of trying again
+        self.retry_after = retry_after
+
+        self.lookups = 0
+        self.failures = 0
+
+        self._city = None
+        self._resolved_at = 0.0
+        self._failed_at = None
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+
+        if not self.static_location:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._city = data['city']
+            self._resolved_at = float(data['resolved_at'])
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"⚠️  Could not load saved location: {e}")
+
+    def _save(self):
+        directory = os.path.dirname(self.path) or '.'
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(suffix='.part', dir=directory)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'city': self._city, 'resolved_at': self._resolved_at}, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"⚠️  Could not save location: {e}")
+
+    @property
+    def is_fresh(self):
+        return self._city is not None and time.time() - self._resolved_at < self.ttl
+
+    def resolve(self):
+        """Return the home city without waiting on the network whenever possible"""
+        if self.static_location:
+            return self.static_location
+
+        if self._city:
+            if not self.is_fresh:
+                self.refresh_async()
+            return self._city
+
+        # Nothing known yet: share a lookup that is already running, or do one now
+        thread = self._refresh_thread
+        if thread and thread.is_alive():
+            thread.join(timeout=self.http.timeout_for('ipinfo.io')[1])
+            if self._city:
+                return self._city
+        elif not self._recently_failed():
+            self._lookup()
+            if self._city:
+                return self._city
+        return self.fallback
+
+    def refresh_async(self):
+        """Look the city up in the background (no-op if static, fresh or already running)"""
+        if self.static_location or self.is_fresh or self._recently_failed():
+            return
+        with self._lock:
+            if self._refresh_thread and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(target=self._lookup, name="location", daemon=True)
+            self._refresh_thread.start()
+
+    def _recently_failed(self):
+        return self._failed_at is not None and time.monotonic() - self._failed_at < self.retry_after
+
+    def _lookup(self):
+        """One IP geolocation request; the result is saved for next time"""
+        self.lookups += 1
+        try:
+            response = self.http.get(self.LOOKUP_URL)
+            city = response.text.strip() if response.status_code == 200 else ''
+        except Exception as e:
+            print(f"⚠️  Location lookup failed: {e}")
+            city = ''
+
+        if not city or len(city) > 80:
+            self.failures += 1
+            self._failed_at = time.monotonic()
+            return None
+
+        with self._lock:
+            self._city = city
+            self._resolved_at = time.time()
+            self._failed_at = None
+            self._save()
+        return city
+
+    def stats(self):
+        """Where the home location comes from and how many lookups it took"""
+        return {
+            'city': self.static_location or self._city,
+            'source': 'static' if self.static_location else ('cached' if self._city else 'none'),
+            'fresh': bool(self.static_location) or self.is_fresh,
+            'lookups': self.lookups,
+            'failures': self.failures,
+        }
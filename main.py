@@ -1,12 +1,17 @@
+import os
 import time
 import random
+from concurrent.futures import ThreadPoolExecutor
+from tracing import tracer
 from voice_engine_gtts import VoiceEngine
 from internet_search import InternetSearch
 from command_processor import CommandProcessor
+from prefetch import PrefetchScheduler
 
 
 class NileyAssistant:
-    def __init__(self):
+    def __init__(self, voice=None, internet=None, wake_timeout=300, prefetch=True):
+        """voice/internet may be passed in prebuilt (e.g. a headless replay setup)"""
         print("\n" + "=" * 60)
         print("🤖 NILEY - PERSONAL VOICE ASSISTANT")
         print("=" * 60)
@@ -15,28 +20,56 @@ class NileyAssistant:
         self.wake_words = ["niley", "N", "alexa", "siri", "na", "Nelly", "milo"
                 , "naahi lla", "nil", "kizim", "niall", "Miley", "Nai", "nale", "noi", "Laila", "janim","sanam","Jaana","jannu","honey","sweetie","baby","Nelly"]
 
+        # Speech recognition per mode, e.g. NILEY_WAKE_RECOGNIZER=vosk keeps sleep mode offline;
+        # a comma-separated list is tried in order (NILEY_COMMAND_RECOGNIZER=google,vosk)
+        self.recognizer_backends = {
+            mode: [name.strip() for name in os.environ.get(f"NILEY_{mode.upper()}_RECOGNIZER", "google").split(",")]
+            for mode in ('wake', 'command')
+        }
+
         print(f"\n⚙️  Configuration:")
         print(f"   Wake words: {', '.join(self.wake_words)}")
+        print(f"   Recognizers: wake={','.join(self.recognizer_backends['wake'])}, "
+              f"command={','.join(self.recognizer_backends['command'])}")
         print("=" * 60)
 
         print("\n🚀 Initializing systems...")
 
-        try:
-            # Initialize with your custom wake words
-            self.voice = VoiceEngine(
-                assistant_name="Niley",
-                use_gtts=True,
-                wake_words=self.wake_words
-            )
-            time.sleep(1)
-
-            print("2. Starting internet services...")
-            self.internet = InternetSearch()
-            time.sleep(0.5)
+        # Seconds asleep without a wake word before checking whether anyone is there
+        self.wake_timeout = wake_timeout
 
-            print("3. Loading command processor...")
-            self.processor = CommandProcessor(self.internet)
-            time.sleep(0.5)
+        # Seconds spent in each startup phase
+        self.startup_timings = {}
+        start = time.perf_counter()
+
+        try:
+            # Voice and internet come up in parallel; the processor only needs internet
+            with ThreadPoolExecutor(max_workers=2, thread_name_prefix="init") as pool:
+                print("1. Starting voice engine...")
+                voice_future = pool.submit(self._timed, 'voice', lambda: voice or VoiceEngine(
+                    assistant_name="Niley",
+                    use_gtts=True,
+                    wake_words=self.wake_words,
+                    recognizer_backends=self.recognizer_backends,
+                ))
+
+                print("2. Starting internet services...")
+                internet_future = pool.submit(self._timed, 'internet', lambda: internet or InternetSearch())
+                self.internet = internet_future.result()
+
+                print("3. Loading command processor...")
+                self.processor = self._timed('processor', lambda: CommandProcessor(self.internet))
+
+                self.voice = voice_future.result()
+
+            # Keeps news and weather warm while we sleep
+            self.prefetcher = None
+            if prefetch:
+                self.prefetcher = PrefetchScheduler(self.internet)
+                self.prefetcher.start()
+
+            self.startup_timings['total'] = time.perf_counter() - start
+            self._print_startup_timings()
 
             print("\n✅ All systems ready!")
             print("=" * 60)
@@ -45,6 +78,25 @@ class NileyAssistant:
             print(f"\n❌ Initialization failed: {e}")
             raise
 
+    def _timed(self, phase, factory):
+        """Run factory() and record how long it took"""
+        start = time.perf_counter()
+        try:
+            return factory()
+        finally:
+            self.startup_timings[phase] = time.perf_counter() - start
+
+    def _print_startup_timings(self):
+        """Print the per-phase startup breakdown"""
+        print("\n⏱️  Startup timing:")
+        for phase in ('voice', 'internet', 'processor'):
+            print(f"   {phase:<10} {self.startup_timings[phase] * 1000:7.0f} ms")
+            if phase == 'voice':
+                for step, seconds in self.voice.startup_timings.items():
+                    if step != 'total':
+                        print(f"     ↳ {step:<10} {seconds * 1000:5.0f} ms")
+        print(f"   {'total':<10} {self.startup_timings['total'] * 1000:7.0f} ms")
+
     def startup_greeting(self):
         """Play startup greeting"""
         print("\n🎬 Starting Niley Assistant...")
@@ -54,7 +106,7 @@ class NileyAssistant:
         ]
 
         for greeting in greetings:
-            self.voice.speak(greeting, wait=True)
+            self.voice.speak(greeting, wait=True, priority='chatter')
             time.sleep(0.5)
 
     def active_conversation(self, wake_word_used):
@@ -88,6 +140,7 @@ class NileyAssistant:
 
         while conversation_active:
             command_count += 1
+            tracer.new_turn()
             print(f"\n[Command {command_count}] 🔊 Listening...")
 
             # Listen for command
@@ -126,11 +179,13 @@ class NileyAssistant:
                 break
 
             # Process command
-            response = self.processor.process_command(user_input)
+            with tracer.span('process'):
+                response = self.processor.process_command(user_input)
 
             if response and response != "STOP_COMMAND":
                 print(f"🤖 Response: {response[:80]}...")
-                self.voice.speak(response, wait=True)
+                with tracer.span('speak', chars=len(response)):
+                    self.voice.speak(response, wait=True)
             elif response == "STOP_COMMAND":
                 conversation_active = False
                 break
@@ -153,7 +208,13 @@ class NileyAssistant:
 
             # Wait for wake word
             print(f"\n💤 Sleeping... Waiting for wake up")
-            result = self.voice.wait_for_wake_word(timeout_seconds=300)
+            if self.prefetcher:
+                self.prefetcher.resume()
+            try:
+                result = self.voice.wait_for_wake_word(timeout_seconds=self.wake_timeout)
+            finally:
+                if self.prefetcher:
+                    self.prefetcher.pause()
 
             if not result or not result[0]:
                 print("⏰ Long timeout or no wake word")
@@ -173,7 +234,11 @@ class NileyAssistant:
             wake_word_used, full_text = result
 
             # Have conversation
-            should_continue = self.active_conversation(wake_word_used)
+            try:
+                should_continue = self.active_conversation(wake_word_used)
+            finally:
+                # Sleep-mode spans don't belong to the last command
+                tracer.end_turn()
 
             if not should_continue:
                 print("\n🛑 Exiting main loop...")
@@ -197,7 +262,10 @@ class NileyAssistant:
         message = random.choice(shutdown_messages)
         self.voice.speak(message, wait=True)
 
+        if self.prefetcher:
+            self.prefetcher.stop()
         self.voice.stop()
+        self.internet.close()
         time.sleep(1)
 
         print("\n""Niley has been shut down.")
@@ -209,6 +277,14 @@ def main():
     print("🚀 Launching Niley Assistant...")
     print("   Wake words: niley, N, alexa, siri, computer, assistant")
 
+    # NILEY_TRACE=1 traces to the default file, any other value is used as the path
+    trace_setting = os.environ.get("NILEY_TRACE")
+    if trace_setting:
+        if trace_setting == "1":
+            tracer.enable()
+        else:
+            tracer.enable(trace_setting)
+
     try:
         assistant = NileyAssistant()
         assistant.run()
@@ -222,6 +298,7 @@ def main():
         traceback.print_exc()
 
     finally:
+        tracer.disable()
         input("\nPress Enter to exit...")
 
 
@@ -0,0 +1,242 @@
+import threading
+import time
+
+import requests
+
+
+class PrefetchJob:
+    """One cached answer kept warm: what to fetch, where it goes and how often"""
+
+    def __init__(self, namespace, query, fetch, host, interval):
+        self.namespace = namespace
+        self.query = query
+        self.fetch = fetch
+        self.host = host
+        self.interval = interval
+
+        self.next_due = 0.0
+        self.failures = 0
+
+
+class PrefetchScheduler:
+    """
+    Refresh likely answers (headlines, home and recent-city weather) while the assistant sleeps
+    Results go straight into InternetSearch's ResponseCache, so the next question is a cache hit
+    """
+
+    # Minimum seconds between two prefetches to the same host
+    DEFAULT_HOST_GAPS = {
+        'reddit.com': 60,
+        'wttr.in': 5,
+    }
+
+    def __init__(self, internet, news_interval=None, weather_interval=None, refresh_ratio=0.8,
+                 max_requests_per_hour=40, host_gaps=None, max_backoff=30 * 60,
+                 offline_backoff=30, max_offline_backoff=15 * 60):
+        self.internet = internet
+        cache_ttls = internet.cache.ttls
+        # Refresh a little before the cached answer expires
+        self.news_interval = news_interval or cache_ttls['news'] * refresh_ratio
+        self.weather_interval = weather_interval or cache_ttls['weather'] * refresh_ratio
+
+        # Token bucket over all prefetches, plus a per-host gap
+        self.max_requests_per_hour = max_requests_per_hour
+        self.host_gaps = dict(self.DEFAULT_HOST_GAPS)
+        if host_gaps:
+            self.host_gaps.update(host_gaps)
+        self.max_backoff = max_backoff
+
+        # While the network looks down nothing is fetched; the wait doubles up to the max
+        self.offline_backoff = offline_backoff
+        self.max_offline_backoff = max_offline_backoff
+        self.online = True
+
+        self.refreshed = 0
+        self.skipped_fresh = 0
+        self.failures = 0
+        self.offline_events = 0
+
+        self._jobs = {}  # (namespace, normalized query) -> PrefetchJob
+        self._tokens = float(max_requests_per_hour)
+        self._tokens_at = time.monotonic()
+        self._host_last = {}
+        self._offline_until = 0.0
+        self._current_offline_backoff = offline_backoff
+
+        self._active = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the worker thread (paused until resume())"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="prefetch", daemon=True)
+        self._thread.start()
+
+    def resume(self):
+        """The assistant is asleep: prefetch in the background"""
+        self._active.set()
+
+    def pause(self):
+        """The assistant is awake: leave the network to the foreground (a running fetch finishes)"""
+        self._active.clear()
+
+    def stop(self):
+        """Stop the worker thread"""
+        self._stopped.set()
+        self._active.set()  # wake the worker so it can exit
+        if self._thread:
+            self._thread.join(timeout=2)
+        self._active.clear()
+        stats = self.stats()
+        print(f"📥 Prefetch: {stats['refreshed']} refreshed, {stats['skipped_fresh']} already fresh, "
+              f"{stats['failures']} failed")
+
+    def _sync_jobs(self):
+        """News, home weather and weather for recently asked cities"""
+        internet = self.internet
+        wanted = {
+            ('news', 'worldnews'): lambda: PrefetchJob(
+                'news', 'worldnews', internet._fetch_news, 'reddit.com', self.news_interval),
+            ('weather', 'your location'): lambda: PrefetchJob(
+                'weather', 'your location', lambda: internet._fetch_weather("your location"),
+                'wttr.in', self.weather_interval),
+        }
+        for city in internet.recent_cities():
+            wanted[('weather', internet.cache.normalize(city))] = (
+                lambda city=city: PrefetchJob('weather', city, lambda: internet._fetch_weather(city),
+                                              'wttr.in', self.weather_interval))
+
+        for key in list(self._jobs):
+            if key not in wanted:
+                del self._jobs[key]
+        for key, make_job in wanted.items():
+            if key not in self._jobs:
+                self._jobs[key] = make_job()
+
+    def _take_token(self, now):
+        """Spend one request from the hourly budget if there is one"""
+        rate = self.max_requests_per_hour / 3600.0
+        self._tokens = min(self._tokens + (now - self._tokens_at) * rate, float(self.max_requests_per_hour))
+        self._tokens_at = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _next_job(self, now):
+        """The first job that is due, not still fresh in the cache, and allowed by its host gap"""
+        for job in self._jobs.values():
+            if now < job.next_due:
+                continue
+            age = self.internet.cache.age(job.namespace, job.query)
+            if age is not None and age < job.interval:
+                # Someone asked recently, the cached answer is still fresh
+                job.next_due = now + job.interval - age
+                self.skipped_fresh += 1
+                continue
+            last = self._host_last.get(job.host)
+            if last is not None and now - last < self.host_gaps.get(job.host, 0):
+                continue
+            return job
+        return None
+
+    def _run(self):
+        while not self._stopped.is_set():
+            if not self._active.wait(timeout=1) or self._stopped.is_set():
+                continue
+
+            now = time.monotonic()
+            if now < self._offline_until:
+                self._stopped.wait(min(self._offline_until - now, 1))
+                continue
+
+            self._sync_jobs()
+            job = self._next_job(now)
+            if job is None or not self._take_token(now):
+                self._stopped.wait(1)
+                continue
+
+            self._host_last[job.host] = now
+            self._run_job(job)
+
+    def _run_job(self, job):
+        started = time.monotonic()
+        try:
+            value = job.fetch()
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            self._went_offline(e)
+            return
+        except Exception as e:
+            print(f"⚠️  Prefetch of {job.namespace} failed: {e}")
+            value = None
+
+        if value is None:
+            # No data or a rate-limited reply: back off this job only
+            self.failures += 1
+            job.failures += 1
+            job.next_due = started + min(job.interval * 2 ** job.failures, self.max_backoff)
+            return
+
+        self.internet.cache.put(job.namespace, job.query, value)
+        self.refreshed += 1
+        job.failures = 0
+        job.next_due = started + job.interval
+        if not self.online:
+            print("🌐 Network is back, prefetching resumed")
+        self.online = True
+        self._current_offline_backoff = self.offline_backoff
+
+    def _went_offline(self, error):
+        if self.online:
+            print(f"📴 Network unavailable, pausing prefetch ({error.__class__.__name__})")
+            self.offline_events += 1
+        self.online = False
+        self._offline_until = time.monotonic() + self._current_offline_backoff
+        self._current_offline_backoff = min(self._current_offline_backoff * 2, self.max_offline_backoff)
+
+    def stats(self):
+        """Prefetch counters"""
+        return {
+            'refreshed': self.refreshed,
+            'skipped_fresh': self.skipped_fresh,
+            'failures': self.failures,
+            'offline_events': self.offline_events,
+            'online': self.online,
+            'jobs': len(self._jobs),
+        }
+
+
+# Test function
+def test_prefetch():
+    """Prefetch news and weather for a few seconds"""
+    from internet_search import InternetSearch
+
+    print("\n" + "=" * 60)
+    print("TESTING PREFETCH")
+    print("=" * 60)
+
+    internet = InternetSearch()
+    internet._remember_city("Paris")
+    prefetcher = PrefetchScheduler(internet, host_gaps={'wttr.in': 0})
+    prefetcher.start()
+    prefetcher.resume()
+    time.sleep(10)
+    prefetcher.stop()
+
+    print(f"\n1. Prefetch: {prefetcher.stats()}")
+    start = time.time()
+    internet.get_news_basic()
+    internet.get_weather_basic("Paris")
+    print(f"2. News and weather answered in {(time.time() - start) * 1000:.1f} ms")
+    internet.close()
+
+    print("\n" + "=" * 60)
+    print("Prefetch test complete!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_prefetch()
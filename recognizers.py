@@ -0,0 +1,184 @@
+import json
+import threading
+import time
+
+import speech_recognition as sr
+
+
+class RecognitionError(Exception):
+    """The backend could not run (network down, API error, missing model)"""
+
+
+class RecognizerBackend:
+    """Speech-to-text engine with latency counters; recognize() returns text or None"""
+
+    name = 'base'
+    offline = False
+
+    def __init__(self):
+        self.calls = 0
+        self.recognized = 0
+        self.unknown = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def recognize(self, audio):
+        """Text for an AudioData, None if nothing was understood; raises RecognitionError"""
+        start = time.perf_counter()
+        outcome = 'errors'
+        try:
+            text = self._recognize(audio)
+            text = text.strip() if text else None
+            outcome = 'recognized' if text else 'unknown'
+            return text
+        except sr.UnknownValueError:
+            outcome = 'unknown'
+            return None
+        except sr.RequestError as e:
+            raise RecognitionError(str(e)) from e
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.calls += 1
+                setattr(self, outcome, getattr(self, outcome) + 1)
+                self.total_ms += elapsed_ms
+                self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def _recognize(self, audio):
+        raise NotImplementedError
+
+    def stats(self):
+        """Call counts and latency in milliseconds"""
+        with self._lock:
+            return {
+                'backend': self.name,
+                'calls': self.calls,
+                'recognized': self.recognized,
+                'unknown': self.unknown,
+                'errors': self.errors,
+                'avg_ms': self.total_ms / self.calls if self.calls else 0.0,
+                'max_ms': self.max_ms,
+            }
+
+
+class GoogleBackend(RecognizerBackend):
+    """Google Web Speech API (network)"""
+
+    name = 'google'
+
+    def __init__(self, recognizer=None, language='en-US', key=None):
+        super().__init__()
+        self.recognizer = recognizer or sr.Recognizer()
+        self.language = language
+        self.key = key
+
+    def _recognize(self, audio):
+        return self.recognizer.recognize_google(audio, key=self.key, language=self.language)
+
+
+class SphinxBackend(RecognizerBackend):
+    """CMU Sphinx through speech_recognition (offline, needs the pocketsphinx package)"""
+
+    name = 'sphinx'
+    offline = True
+
+    def __init__(self, recognizer=None, language='en-US', keywords=None):
+        super().__init__()
+        try:
+            import pocketsphinx  # noqa: F401  fail now rather than on the first phrase
+        except ImportError as e:
+            raise RecognitionError("pocketsphinx is not installed") from e
+
+        self.recognizer = recognizer or sr.Recognizer()
+        self.language = language
+        # Optional [(phrase, sensitivity 0..1)] for keyword spotting instead of full decoding
+        self.keywords = keywords
+
+    def _recognize(self, audio):
+        return self.recognizer.recognize_sphinx(audio, language=self.language,
+                                                keyword_entries=self.keywords)
+
+
+class VoskBackend(RecognizerBackend):
+    """Vosk/Kaldi model on disk (offline, needs the vosk package and a downloaded model)"""
+
+    name = 'vosk'
+    offline = True
+    SAMPLE_RATE = 16000
+
+    def __init__(self, model_path='model', phrases=None):
+        super().__init__()
+        try:
+            import vosk
+        except ImportError as e:
+            raise RecognitionError("vosk is not installed") from e
+
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        try:
+            self.model = vosk.Model(model_path)
+        except Exception as e:
+            raise RecognitionError(f"could not load the model at '{model_path}': {e}") from e
+        # Optional word list to restrict decoding to (e.g. wake words), faster and more accurate
+        self.grammar = json.dumps(list(phrases) + ["[unk]"]) if phrases else None
+
+    def _recognize(self, audio):
+        if self.grammar:
+            recognizer = self._vosk.KaldiRecognizer(self.model, self.SAMPLE_RATE, self.grammar)
+        else:
+            recognizer = self._vosk.KaldiRecognizer(self.model, self.SAMPLE_RATE)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=self.SAMPLE_RATE, convert_width=2))
+        text = json.loads(recognizer.FinalResult()).get('text', '')
+        return text.replace('[unk]', '').strip()
+
+
+class StubBackend(RecognizerBackend):
+    """
+    Deterministic backend for tests and headless runs
+    Returns scripted responses in order (None = not understood, an exception instance is raised);
+    once the script runs out, the audio's own transcript (replay.ScriptedAudio) or default
+    """
+
+    name = 'stub'
+    offline = True
+
+    def __init__(self, responses=None, default=None, latency=0.0):
+        super().__init__()
+        self.responses = list(responses or [])
+        self.default = default
+        self.latency = latency
+
+    def _recognize(self, audio):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            if self.responses:
+                response = self.responses.pop(0)
+            else:
+                response = getattr(audio, 'transcript', None) or self.default
+        if isinstance(response, Exception):
+            raise response
+        if response is None:
+            raise sr.UnknownValueError()
+        return response
+
+
+BACKENDS = {
+    'google': GoogleBackend,
+    'sphinx': SphinxBackend,
+    'vosk': VoskBackend,
+    'stub': StubBackend,
+}
+
+
+def make_backend(spec, recognizer=None):
+    """Build a backend from a name ('google', 'sphinx', 'vosk', 'stub') or return an instance as is"""
+    if isinstance(spec, RecognizerBackend):
+        return spec
+    if spec not in BACKENDS:
+        raise ValueError(f"Unknown recognizer backend '{spec}' (choose from {', '.join(BACKENDS)})")
+    if spec in ('google', 'sphinx'):
+        return BACKENDS[spec](recognizer)
+    return BACKENDS[spec]()
@@ -0,0 +1,285 @@
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+import speech_recognition as sr
+
+from stub_search import StubInternetSearch
+
+
+class ScriptedAudio(sr.AudioData):
+    """AudioData that also carries what was said, so a StubBackend can 'recognize' it exactly"""
+
+    def __init__(self, frame_data, sample_rate, sample_width, transcript=None):
+        super().__init__(frame_data, sample_rate, sample_width)
+        self.transcript = transcript
+
+
+def synthetic_phrase(text, sample_rate=16000, words_per_second=2.5, padding=0.3):
+    """
+    A voiced-sounding tone burst about as long as text takes to say
+    It has padding seconds of near-silence on each side, like a phrase cut by recognizer.listen()
+    """
+    duration = max(len(text.split()) / words_per_second, 0.3)
+    t = np.arange(int(sample_rate * duration)) / sample_rate
+    pitch = 140 + 20 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    signal = sum(np.sin(phase * harmonic) / harmonic for harmonic in (1, 2, 3, 4))
+    # Syllable-rate envelope, so it isn't one flat tone
+    signal *= 0.5 + 0.5 * np.abs(np.sin(np.pi * words_per_second * t))
+    signal = signal / np.max(np.abs(signal)) * 0.3
+
+    silence = np.zeros(int(sample_rate * padding))
+    signal = np.concatenate([silence, signal, silence])
+    signal += np.random.default_rng(len(text)).normal(0, 0.001, len(signal))  # room noise
+    samples = (signal * 32767).astype(np.int16)
+    return ScriptedAudio(samples.tobytes(), sample_rate, 2, transcript=text)
+
+
+def load_wav(path):
+    with sr.AudioFile(path) as source:
+        return sr.Recognizer().record(source)
+
+
+class ReplaySource:
+    """
+    Stand-in for AudioCapture that plays back a script instead of a microphone
+    Script items are text (a ScriptedAudio phrase), a WAV path ({'wav': ...}) or an AudioData,
+    optionally with 'gap' seconds of silence before them. speed scales time (2.0 = twice as fast,
+    0 = no waiting at all). With a sink, each phrase after the first waits for the assistant's reply.
+    """
+
+    def __init__(self, script, speed=1.0, sink=None, reply_timeout=30, phrase_time_limit=8):
+        self.script = [self._normalize(item) for item in script]
+        self.speed = speed
+        self.sink = sink
+        self.reply_timeout = reply_timeout
+        # Same attributes VoiceEngine sets on AudioCapture
+        self.phrase_time_limit = phrase_time_limit
+        self.is_muted = None
+
+        self.phrases = queue.Queue()
+        # (index, transcript, ended_at) for each phrase, for end-to-end latency
+        self.emitted = []
+        self.exhausted = threading.Event()
+
+        self._running = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _normalize(item):
+        if isinstance(item, (str, sr.AudioData)):
+            item = {'say': item}
+        return dict(item)
+
+    @property
+    def running(self):
+        return self._running.is_set()
+
+    def start(self, calibrate_duration=None):
+        """Start replaying (there is nothing to calibrate)"""
+        if self.running:
+            return
+        self._running.set()
+        self._thread = threading.Thread(target=self._run, name="audio-replay", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running.clear()
+        if self._thread:
+            self._thread.join(timeout=2)
+
+    def _sleep(self, seconds):
+        if self.speed and seconds > 0:
+            time.sleep(seconds / self.speed)
+
+    def _audio_for(self, item):
+        if 'wav' in item:
+            return load_wav(item['wav'])
+        said = item['say']
+        return said if isinstance(said, sr.AudioData) else synthetic_phrase(said)
+
+    def _run(self):
+        for index, item in enumerate(self.script):
+            if not self.running:
+                return
+            if self.sink and index > 0:
+                # Like a person, wait for the answer before saying the next thing
+                self.sink.wait_for_reply(after=self.emitted[-1][2], timeout=self.reply_timeout,
+                                         settle=0.3 / self.speed if self.speed else 0.1)
+            self._sleep(item.get('gap', 0.5))
+
+            audio = self._audio_for(item)
+            # "Speaking" the phrase takes as long as the audio
+            self._sleep(len(audio.frame_data) / float(audio.sample_rate * audio.sample_width))
+            ended_at = time.monotonic()
+            self.emitted.append((index, getattr(audio, 'transcript', item.get('wav')), ended_at))
+            self.phrases.put((ended_at, audio))
+        self.exhausted.set()
+
+    def get_phrase(self, timeout=None):
+        """Next phrase, or None; after the script ends this is silence (scaled by speed)"""
+        if self.exhausted.is_set() and self.phrases.empty():
+            if timeout:
+                time.sleep(timeout / self.speed if self.speed else min(timeout, 0.05))
+            return None
+        if timeout is not None and self.speed:
+            timeout /= self.speed
+        try:
+            return self.phrases.get(timeout=timeout)[1]
+        except queue.Empty:
+            return None
+
+    def flush(self):
+        while True:
+            try:
+                self.phrases.get_nowait()
+            except queue.Empty:
+                return
+
+    def stats(self):
+        return {
+            'captured': len(self.emitted),
+            'dropped': 0,
+            'muted': 0,
+            'queued': self.phrases.qsize(),
+        }
+
+
+class NullSink:
+    """Audio output that plays nothing; speaking takes words/words_per_second scaled by speed"""
+
+    def __init__(self, speed=0, words_per_second=3.0):
+        self.speed = speed
+        self.words_per_second = words_per_second
+
+    def speak(self, text):
+        if self.speed:
+            time.sleep(len(text.split()) / self.words_per_second / self.speed)
+        return True
+
+
+class RecordingSink(NullSink):
+    """NullSink that records every utterance as (text, started_at, ended_at)"""
+
+    def __init__(self, speed=0, words_per_second=3.0):
+        super().__init__(speed, words_per_second)
+        self.spoken = []
+        self._changed = threading.Condition()
+
+    def speak(self, text):
+        started_at = time.monotonic()
+        super().speak(text)
+        with self._changed:
+            self.spoken.append((text, started_at, time.monotonic()))
+            self._changed.notify_all()
+        return True
+
+    def wait_for_reply(self, after, timeout=30, settle=0.1):
+        """
+        Block until something has been said since `after` (a monotonic time)
+        and nothing more for `settle` seconds, so a reply in several parts counts as one turn
+        """
+        with self._changed:
+            if not self._changed.wait_for(
+                    lambda: any(started >= after for _, started, _ in self.spoken), timeout=timeout):
+                return False
+            count = len(self.spoken)
+            while self._changed.wait_for(lambda: len(self.spoken) > count, timeout=settle):
+                count = len(self.spoken)
+            return True
+
+    def first_reply_after(self, moment):
+        """(text, started_at, ended_at) of the first utterance that started after moment"""
+        for entry in self.spoken:
+            if entry[1] >= moment:
+                return entry
+        return None
+
+
+def response_latencies(source, sink):
+    """Per phrase: how long from the end of the phrase until the assistant started answering"""
+    latencies = []
+    for index, transcript, ended_at in source.emitted:
+        reply = sink.first_reply_after(ended_at)
+        latencies.append({
+            'phrase': transcript,
+            'reply': reply[0] if reply else None,
+            'ms': round((reply[1] - ended_at) * 1000, 1) if reply else None,
+        })
+    return latencies
+
+
+def run_headless(script, speed=0, wake_timeout=2, internet=None):
+    """
+    Run the full wake -> converse -> sleep -> shutdown cycle on a script, with no sound card
+    Returns (sink, source, seconds); speech is recognized by StubBackend from the script text
+    """
+    from main import NileyAssistant
+    from recognizers import StubBackend
+    from voice_engine_gtts import VoiceEngine
+
+    if internet is None:
+        internet = StubInternetSearch()
+
+    sink = RecordingSink(speed=speed)
+    source = ReplaySource(script, speed=speed, sink=sink)
+    stub = StubBackend()
+    voice = VoiceEngine(
+        audio_source=source,
+        audio_sink=sink,
+        tts_cache=False,
+        recognizer_backends={'wake': stub, 'command': stub},
+    )
+
+    start = time.perf_counter()
+    assistant = NileyAssistant(voice=voice, internet=internet, wake_timeout=wake_timeout, prefetch=False)
+    assistant.run()
+    return sink, source, time.perf_counter() - start
+
+
+DEFAULT_SCRIPT = [
+    "hey niley",
+    "what time is it",
+    "what's the weather in paris",
+    "calculate 15 times 27",
+    "tell me a joke",
+    "go to sleep",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Niley headless on a scripted conversation")
+    parser.add_argument("script", nargs="?", help="JSON list of phrases: \"text\", {\"say\": ..., \"gap\": s} or {\"wav\": path}")
+    parser.add_argument("--speed", type=float, default=0, help="time scale: 1 = real time, 0 = no waiting")
+    parser.add_argument("--wake-timeout", type=float, default=2, help="seconds asleep before giving up")
+    parser.add_argument("--real-internet", action="store_true", help="answer with InternetSearch instead of the stub")
+    args = parser.parse_args()
+
+    script = DEFAULT_SCRIPT
+    if args.script:
+        with open(args.script, 'r', encoding='utf-8') as f:
+            script = json.load(f)
+
+    internet = None
+    if args.real_internet:
+        from internet_search import InternetSearch
+        internet = InternetSearch()
+
+    sink, source, seconds = run_headless(script, args.speed, args.wake_timeout, internet)
+
+    print("\n" + "=" * 60)
+    print(f"🎞️  REPLAY: {len(source.emitted)} phrases, {len(sink.spoken)} replies in {seconds:.2f}s")
+    print("=" * 60)
+    for row in response_latencies(source, sink):
+        latency = f"{row['ms']:>8.1f} ms" if row['ms'] is not None else "   no reply"
+        print(f"   {latency}  {row['phrase']!r} -> {(row['reply'] or '')[:50]!r}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class ResponseCache:
+    """In-memory LRU cache of final answers with per-type TTL and stale-while-revalidate"""
+
+    # Seconds an answer stays fresh, per data type
+    DEFAULT_TTLS = {
+        'weather': 10 * 60,
+        'news': 30 * 60,
+        'search': 6 * 60 * 60,
+    }
+
+    def __init__(self, ttls=None, max_entries=256, stale_factor=1.0, persist_path=None):
+        self.ttls = dict(self.DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.max_entries = max_entries
+        # An expired answer may still be served for ttl * stale_factor while it refreshes
+        self.stale_factor = stale_factor
+        self.persist_path = persist_path
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+
+        self._entries = OrderedDict()  # (namespace, query) -> (value, stored_at)
+        self._refreshing = set()
+        self._fetching = {}  # key -> Future of the miss being fetched, shared by concurrent callers
+        self._lock = threading.Lock()
+        # Held for a whole save, so snapshots reach the file in the order they were taken
+        self._save_lock = threading.Lock()
+
+        if self.persist_path:
+            self._load()
+
+    @staticmethod
+    def normalize(query):
+        """Lowercase, collapse whitespace and drop surrounding punctuation"""
+        query = re.sub(r'\s+', ' ', str(query).lower())
+        return query.strip(' ?!.,;:')
+
+    def _ttl(self, namespace):
+        return self.ttls.get(namespace, 5 * 60)
+
+    def get_or_fetch(self, namespace, query, fetch):
+        """
+        Return a cached answer, or call fetch() and cache its result
+        fetch() returning None means "no answer" and is never cached
+        Concurrent misses on one key share a single fetch() (and its result or exception)
+        """
+        key = (namespace, self.normalize(query))
+        ttl = self._ttl(namespace)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                value, stored_at = entry
+                age = time.time() - stored_at
+                if age < ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                if age < ttl * (1 + self.stale_factor):
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    self._refresh_async(key, fetch)
+                    return value
+            self.misses += 1
+            pending = self._fetching.get(key)
+            if pending is None:
+                pending = self._fetching[key] = Future()
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            return pending.result()
+
+        try:
+            value = fetch()
+            if value is not None:
+                self.put(namespace, query, value)
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        else:
+            pending.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                del self._fetching[key]
+
+    def _refresh_async(self, key, fetch):
+        """Refresh an entry in the background (called with the lock held)"""
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        def refresh():
+            try:
+                value = fetch()
+                if value is not None:
+                    self.put(key[0], key[1], value)
+                    with self._lock:
+                        self.refreshes += 1
+            except Exception as e:
+                print(f"⚠️  Background refresh failed for {key[0]}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def put(self, namespace, query, value):
+        """Store an answer, evicting the least recently used one if full"""
+        key = (namespace, self.normalize(query))
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        if self.persist_path:
+            self.save()
+
+    def age(self, namespace, query):
+        """Seconds since the answer was stored, or None if it isn't cached"""
+        key = (namespace, self.normalize(query))
+        with self._lock:
+            entry = self._entries.get(key)
+        return time.time() - entry[1] if entry else None
+
+    def invalidate(self, namespace=None):
+        """Drop every entry, or only those of one namespace"""
+        with self._lock:
+            for key in list(self._entries):
+                if namespace is None or key[0] == namespace:
+                    del self._entries[key]
+
+    def _load(self):
+        try:
+            with open(self.persist_path, 'r', encoding='utf-8') as f:
+                rows = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Could not load response cache: {e}")
+            return
+
+        now = time.time()
+        for row in rows:
+            namespace, query, value, stored_at = row
+            # Skip anything too old to be served even as stale
+            if now - stored_at < self._ttl(namespace) * (1 + self.stale_factor):
+                self._entries[(namespace, query)] = (value, stored_at)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def save(self):
+        """Write entries to persist_path atomically"""
+        if not self.persist_path:
+            return
+        with self._save_lock:
+            with self._lock:
+                rows = [[ns, query, value, stored_at]
+                        for (ns, query), (value, stored_at) in self._entries.items()]
+
+            directory = os.path.dirname(self.persist_path) or '.'
+            temp_path = None
+            try:
+                os.makedirs(directory, exist_ok=True)
+                fd, temp_path = tempfile.mkstemp(suffix='.part', dir=directory)
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(rows, f)
+                os.replace(temp_path, self.persist_path)
+            except OSError as e:
+                print(f"⚠️  Could not save response cache: {e}")
+                if temp_path and os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'refreshes': self.refreshes,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+            }
+
+
+# Test function
+def test_response_cache():
+    """Test response cache"""
+    print("\n" + "=" * 60)
+    print("TESTING RESPONSE CACHE")
+    print("=" * 60)
+
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return f"Weather in Paris: fetch #{len(calls)}"
+
+    cache = ResponseCache(ttls={'weather': 0.2}, max_entries=2)
+
+    print(f"\n1. Miss: {cache.get_or_fetch('weather', 'Paris', fetch)}")
+    print(f"2. Hit: {cache.get_or_fetch('weather', '  paris? ', fetch)}")
+    time.sleep(0.25)
+    print(f"3. Stale (refreshing): {cache.get_or_fetch('weather', 'Paris', fetch)}")
+    time.sleep(0.05)
+    print(f"4. Refreshed: {cache.get_or_fetch('weather', 'Paris', fetch)}")
+
+    def slow_fetch():
+        time.sleep(0.1)
+        return fetch()
+
+    threads = [threading.Thread(target=cache.get_or_fetch, args=('weather', 'Rome', slow_fetch)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"5. Four concurrent misses, fetches so far: {len(calls)}")
+    print(f"6. Stats: {cache.stats()}")
+
+    print("\n" + "=" * 60)
+    print("Response cache test complete!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_response_cache()
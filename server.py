@@ -0,0 +1,355 @@
+import argparse
+import asyncio
+import io
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web, WSMsgType
+
+from command_processor import CommandProcessor, SessionState
+from internet_search import InternetSearch
+
+
+# Intents that go out to the network (None falls back to a web search)
+NETWORK_INTENTS = frozenset(['weather', 'news', 'search', None])
+
+
+class TokenBucket:
+    """rate commands per second on average, with bursts of up to burst (rate 0 = unlimited)"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Spend a token; returns 0 on success, else seconds until one is available"""
+        if not self.rate:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.tokens + (now - self.updated) * self.rate, float(self.burst))
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class ServerSession(SessionState):
+    """A client's conversation: processor state plus its rate limit and in-flight count"""
+
+    def __init__(self, session_id, rate, burst):
+        super().__init__()
+        self.session_id = session_id
+        self.bucket = TokenBucket(rate, burst)
+        self.pending = 0
+        self.commands = 0
+        self.created_at = time.monotonic()
+        self.last_seen = self.created_at
+
+
+class Rejected(Exception):
+    """A command refused for backpressure or rate limiting (HTTP status and retry hint)"""
+
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class NileyServer:
+    """
+    Many concurrent text/voice sessions served by one CommandProcessor and one InternetSearch
+    Blocking work runs on a thread pool; network-bound intents also share a fetch limit
+    """
+
+    def __init__(self, internet=None, max_sessions=1000, session_idle_timeout=30 * 60,
+                 rate=1.0, burst=5, max_pending_per_session=2, max_fetches=16, max_queued=64,
+                 workers=32, max_upload_bytes=5 * 1024 * 1024):
+        if rate < 0:
+            raise ValueError("rate must be 0 (unlimited) or more commands per second")
+        if burst < 1:
+            raise ValueError("burst must be at least 1 command")
+
+        # Each search races DuckDuckGo and Wikipedia, so size the shared pools for max_fetches of them
+        self.internet = internet or InternetSearch(pool_maxsize=max_fetches, search_workers=2 * max_fetches)
+        self.processor = CommandProcessor(self.internet)
+
+        self.max_sessions = max_sessions
+        self.session_idle_timeout = session_idle_timeout
+        self.rate = rate
+        self.burst = burst
+        # Commands one session may have in flight before it gets 429s
+        self.max_pending_per_session = max_pending_per_session
+        # Outbound fetches at once, and how many may wait for a slot before we shed load;
+        # more fetches than the InternetSearch can run would only queue searches past their deadline
+        self.max_fetches = min(max_fetches, getattr(self.internet, 'search_capacity', max_fetches))
+        self.max_queued = max_queued
+        self.max_upload_bytes = max_upload_bytes
+
+        self.sessions = {}
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="server")
+        self._fetch_slots = None
+        self._waiting = 0
+
+        self.served = 0
+        self.rejected = 0
+        self.total_ms = 0.0
+
+    def create_app(self):
+        app = web.Application(client_max_size=self.max_upload_bytes)
+        app.add_routes([
+            web.get('/health', self.handle_health),
+            web.get('/stats', self.handle_stats),
+            web.post('/sessions', self.handle_create_session),
+            web.delete('/sessions/{session_id}', self.handle_delete_session),
+            web.post('/sessions/{session_id}/command', self.handle_command),
+            web.post('/sessions/{session_id}/voice', self.handle_voice),
+            web.get('/ws', self.handle_websocket),
+        ])
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+    async def _on_startup(self, app):
+        self._fetch_slots = asyncio.Semaphore(self.max_fetches)
+        app['sweeper'] = asyncio.create_task(self._sweep_sessions())
+
+    async def _on_cleanup(self, app):
+        app['sweeper'].cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.internet.close()
+
+    async def _sweep_sessions(self):
+        """Forget sessions that have been idle too long"""
+        while True:
+            await asyncio.sleep(60)
+            cutoff = time.monotonic() - self.session_idle_timeout
+            for session_id in [sid for sid, s in self.sessions.items()
+                               if s.last_seen < cutoff and not s.pending]:
+                del self.sessions[session_id]
+
+    def new_session(self):
+        if len(self.sessions) >= self.max_sessions:
+            raise Rejected(503, "Too many sessions", retry_after=30)
+        session_id = secrets.token_urlsafe(16)
+        session = ServerSession(session_id, self.rate, self.burst)
+        self.sessions[session_id] = session
+        return session
+
+    def _session(self, request):
+        session = self.sessions.get(request.match_info['session_id'])
+        if session is None:
+            raise web.HTTPNotFound(text="Unknown session")
+        return session
+
+    def _admit(self, session):
+        """Spend a rate-limit token and check the in-flight limit; raises Rejected"""
+        session.last_seen = time.monotonic()
+        wait = session.bucket.take()
+        if wait:
+            raise Rejected(429, "Rate limit exceeded", retry_after=wait)
+        if session.pending >= self.max_pending_per_session:
+            raise Rejected(429, "Too many commands in flight", retry_after=1)
+
+    async def _fetch(self, func, *args):
+        """Run a network-bound call on the pool once a fetch slot is free (503 if too many wait)"""
+        if self._waiting >= self.max_queued:
+            raise Rejected(503, "Server busy", retry_after=2)
+        self._waiting += 1
+        try:
+            await self._fetch_slots.acquire()
+        finally:
+            self._waiting -= 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self._fetch_slots.release()
+
+    async def run_command(self, session, text):
+        """Rate-limit, then process one command off the event loop; returns the reply dict"""
+        text = (text or '').strip()
+        if not text:
+            raise Rejected(400, "Empty command")
+        self._admit(session)
+        session.pending += 1
+        try:
+            return await self._process(session, text)
+        finally:
+            session.pending -= 1
+
+    async def _process(self, session, text):
+        """Process an admitted command, network-bound intents under the fetch limit"""
+        loop = asyncio.get_running_loop()
+        command = text.lower().strip()
+        start = time.perf_counter()
+        # Matching is CPU work on caller-controlled text, so it stays off the event loop too
+        intent, slots = await loop.run_in_executor(self.executor, self.processor.match_intent, command)
+        if intent in NETWORK_INTENTS:
+            response = await self._fetch(self.processor.respond, intent, slots, command, session)
+        else:
+            response = await loop.run_in_executor(
+                self.executor, self.processor.respond, intent, slots, command, session)
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        session.commands += 1
+        self.served += 1
+        self.total_ms += elapsed_ms
+
+        ended = response == "STOP_COMMAND"
+        return {
+            'intent': intent,
+            'response': "Goodbye!" if ended else response,
+            'end': ended,
+            'ms': round(elapsed_ms, 1),
+        }
+
+    def _rejection(self, error):
+        self.rejected += 1
+        headers = {}
+        if error.retry_after:
+            headers['Retry-After'] = str(max(int(error.retry_after + 0.999), 1))
+        return web.json_response({'error': str(error)}, status=error.status, headers=headers)
+
+    async def handle_health(self, request):
+        return web.json_response({'status': 'ok'})
+
+    async def handle_stats(self, request):
+        return web.json_response({
+            'sessions': len(self.sessions),
+            'served': self.served,
+            'rejected': self.rejected,
+            'avg_ms': self.total_ms / self.served if self.served else 0.0,
+            'fetches_waiting': self._waiting,
+            'cache': self.internet.cache.stats(),
+        })
+
+    async def handle_create_session(self, request):
+        try:
+            session = self.new_session()
+        except Rejected as e:
+            return self._rejection(e)
+        return web.json_response({'session_id': session.session_id}, status=201)
+
+    async def handle_delete_session(self, request):
+        self.sessions.pop(request.match_info['session_id'], None)
+        return web.Response(status=204)
+
+    async def handle_command(self, request):
+        session = self._session(request)
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            return web.json_response({'error': "Expected JSON {\"text\": ...}"}, status=400)
+        try:
+            return web.json_response(await self.run_command(session, body.get('text')))
+        except Rejected as e:
+            return self._rejection(e)
+
+    async def handle_voice(self, request):
+        """WAV/AIFF/FLAC upload -> speech recognition -> command"""
+        session = self._session(request)
+        # Recognition is a network call too: admit the command before doing any of it
+        try:
+            self._admit(session)
+        except Rejected as e:
+            return self._rejection(e)
+
+        session.pending += 1
+        try:
+            data = await request.read()
+            try:
+                text = await self._fetch(self._transcribe, data)
+            except Rejected as e:
+                return self._rejection(e)
+            except Exception as e:
+                return web.json_response({'error': f"Could not read audio: {e}"}, status=400)
+            if not text:
+                return web.json_response({'error': "No speech recognized"}, status=422)
+            try:
+                reply = await self._process(session, text)
+            except Rejected as e:
+                return self._rejection(e)
+        finally:
+            session.pending -= 1
+
+        reply['text'] = text
+        return web.json_response(reply)
+
+    @staticmethod
+    def _transcribe(data):
+        import speech_recognition as sr
+
+        recognizer = sr.Recognizer()
+        with sr.AudioFile(io.BytesIO(data)) as source:
+            audio = recognizer.record(source)
+        try:
+            return recognizer.recognize_google(audio)
+        except sr.UnknownValueError:
+            return None
+
+    async def handle_websocket(self, request):
+        """One session per socket; messages are {"text": ...}, replies come back in order"""
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+
+        session = self.sessions.get(request.query.get('session', ''))
+        if session is None:
+            try:
+                session = self.new_session()
+            except Rejected as e:
+                self.rejected += 1
+                await ws.close(code=1013, message=str(e).encode())
+                return ws
+        await ws.send_json({'session_id': session.session_id})
+
+        # Commands are handled one at a time, so a fast client is slowed to our pace
+        async for message in ws:
+            if message.type != WSMsgType.TEXT:
+                continue
+            try:
+                text = message.json().get('text')
+            except (ValueError, AttributeError):
+                await ws.send_json({'error': "Expected JSON {\"text\": ...}"})
+                continue
+            try:
+                reply = await self.run_command(session, text)
+            except Rejected as e:
+                self.rejected += 1
+                reply = {'error': str(e), 'retry_after': e.retry_after}
+            await ws.send_json(reply)
+            if reply.get('end'):
+                await ws.close()
+
+        return ws
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Niley HTTP/WebSocket server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--rate", type=float, default=1.0, help="commands per second per session (0 = unlimited)")
+    parser.add_argument("--burst", type=int, default=5, help="commands a session may send at once")
+    parser.add_argument("--max-fetches", type=int, default=16, help="concurrent outbound fetches")
+    parser.add_argument("--max-sessions", type=int, default=1000)
+    args = parser.parse_args()
+
+    print("🚀 Launching Niley server...")
+    try:
+        server = NileyServer(
+            rate=args.rate,
+            burst=args.burst,
+            max_fetches=args.max_fetches,
+            max_sessions=args.max_sessions,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    web.run_app(server.create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
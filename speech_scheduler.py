@@ -0,0 +1,280 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from tracing import tracer
+
+
+# Lower number speaks first
+PRIORITIES = {
+    'alert': 0,
+    'answer': 1,
+    'chatter': 2,
+}
+
+
+class SpeechItem:
+    """One phrase waiting to be spoken; future resolves True if it was said, False if dropped"""
+
+    def __init__(self, text, priority, stream, expires_at, seq):
+        self.text = text
+        self.priority = priority
+        self.stream = stream
+        self.expires_at = expires_at
+        self.seq = seq
+        self.future = Future()
+        # Spans timed while saying it belong to the turn that asked for it
+        self.turn_id = tracer.turn_id
+
+        self.queued_at = time.monotonic()
+        self.started_at = None
+        self.outcome = None
+
+    @property
+    def key(self):
+        return (PRIORITIES[self.priority], self.seq)
+
+    @property
+    def wait_ms(self):
+        """Time spent queued before playback started (or until it was dropped)"""
+        end = self.started_at or time.monotonic()
+        return (end - self.queued_at) * 1000
+
+
+class SpeechScheduler:
+    """
+    The one owner of speech output: a single worker speaks the most urgent pending phrase
+    The queue is bounded (urgent phrases push out chatter), an identical pending phrase is
+    spoken once, and phrases that waited past their TTL are dropped instead of said late
+    """
+
+    # Seconds a phrase may wait before it is stale (None = never)
+    DEFAULT_TTLS = {
+        'alert': None,
+        'answer': 30,
+        'chatter': 10,
+    }
+
+    def __init__(self, say, max_pending=8, ttls=None, interrupt=None, history_size=100):
+        # say(text, stream) speaks on the calling thread and returns True on success
+        self.say = say
+        self.max_pending = max_pending
+        self.ttls = dict(self.DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        # interrupt() cuts the current phrase short, used when an alert arrives during chatter
+        self.interrupt = interrupt
+
+        self.spoken = 0
+        self.failed = 0
+        self.deduplicated = 0
+        self.expired = 0
+        self.evicted = 0
+        self.rejected = 0
+        self.flushed = 0
+        # Queue wait of recent items: {'text', 'priority', 'wait_ms', 'outcome'}
+        self.history = deque(maxlen=history_size)
+        self._waits = {priority: [0, 0.0, 0.0] for priority in PRIORITIES}  # count, total, max
+
+        self._pending = []
+        self._current = None
+        self._seq = 0
+        self._changed = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="speech", daemon=True)
+        self._thread.start()
+
+    def submit(self, text, priority='answer', stream=None, ttl=None):
+        """Queue text for speaking; returns a Future of True (spoken) or False (dropped)"""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown speech priority '{priority}' (choose from {', '.join(PRIORITIES)})")
+        if ttl is None:
+            ttl = self.ttls[priority]
+
+        with self._changed:
+            if not self._running:
+                future = Future()
+                future.set_result(False)
+                return future
+
+            for item in self._pending:
+                if item.text == text:
+                    # Say it once, as urgently as the most urgent request for it
+                    self.deduplicated += 1
+                    if PRIORITIES[priority] < PRIORITIES[item.priority]:
+                        item.priority = priority
+                        item.expires_at = None if ttl is None else time.monotonic() + ttl
+                    return item.future
+
+            self._seq += 1
+            item = SpeechItem(text, priority, stream, None if ttl is None else time.monotonic() + ttl, self._seq)
+
+            if len(self._pending) >= self.max_pending:
+                # Make room by dropping the least urgent, newest phrase, if it is less urgent than this one
+                victim = max(self._pending, key=lambda pending: pending.key)
+                if victim.key < item.key:
+                    self.rejected += 1
+                    self._record(item, 'rejected', False)
+                    return item.future
+                self._pending.remove(victim)
+                self.evicted += 1
+                self._record(victim, 'evicted', False)
+
+            self._pending.append(item)
+            current = self._current
+            self._changed.notify_all()
+
+        if current and self.interrupt and priority == 'alert' and current.priority == 'chatter':
+            self.interrupt()
+        return item.future
+
+    def speak(self, text, priority='answer', stream=None, ttl=None):
+        """Queue text and block until it has been spoken or dropped"""
+        if threading.current_thread() is self._thread:
+            # Called from inside say(): waiting on ourselves would never return
+            return self.say(text, stream)
+        return self.submit(text, priority, stream, ttl).result()
+
+    def flush(self, priorities=None):
+        """Drop pending phrases (of the given priorities, default all); returns how many"""
+        with self._changed:
+            dropped = [item for item in self._pending if priorities is None or item.priority in priorities]
+            for item in dropped:
+                self._pending.remove(item)
+                self._record(item, 'flushed', False)
+            self.flushed += len(dropped)
+        return len(dropped)
+
+    def _next(self):
+        """Most urgent pending item, skipping stale ones; None once stopped"""
+        with self._changed:
+            while True:
+                while self._running and not self._pending:
+                    self._changed.wait()
+                if not self._running:
+                    return None
+
+                item = min(self._pending, key=lambda pending: pending.key)
+                self._pending.remove(item)
+                if item.expires_at is not None and time.monotonic() > item.expires_at:
+                    self.expired += 1
+                    self._record(item, 'expired', False)
+                    continue
+
+                item.started_at = time.monotonic()
+                self._current = item
+                return item
+
+    def _run(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            tracer.turn_id = item.turn_id
+            try:
+                success = bool(self.say(item.text, item.stream))
+            except Exception as e:
+                print(f"⚠️  Speech error: {e}")
+                success = False
+            finally:
+                tracer.end_turn()
+            with self._changed:
+                self._current = None
+                if success:
+                    self.spoken += 1
+                else:
+                    self.failed += 1
+                self._record(item, 'spoken' if success else 'failed', success)
+
+    def _record(self, item, outcome, result):
+        """Log the item's queue wait and resolve its future (called with the lock held)"""
+        item.outcome = outcome
+        wait_ms = item.wait_ms
+        if outcome in ('spoken', 'failed'):
+            waits = self._waits[item.priority]
+            waits[0] += 1
+            waits[1] += wait_ms
+            waits[2] = max(waits[2], wait_ms)
+        self.history.append({
+            'text': item.text[:60],
+            'priority': item.priority,
+            'wait_ms': round(wait_ms, 1),
+            'outcome': outcome,
+        })
+        item.future.set_result(result)
+
+    @property
+    def pending(self):
+        with self._changed:
+            return len(self._pending)
+
+    def stop(self):
+        """Drop everything pending and stop the worker after the current phrase"""
+        self.flush()
+        with self._changed:
+            self._running = False
+            self._changed.notify_all()
+        if self._thread.is_alive() and threading.current_thread() is not self._thread:
+            self._thread.join(timeout=2)
+
+    def stats(self):
+        """Outcome counts, plus queue wait in milliseconds per priority for phrases that played"""
+        with self._changed:
+            waits = {
+                priority: {
+                    'count': count,
+                    'avg_wait_ms': round(total / count, 1) if count else 0.0,
+                    'max_wait_ms': round(longest, 1),
+                }
+                for priority, (count, total, longest) in self._waits.items()
+            }
+            return {
+                'spoken': self.spoken,
+                'failed': self.failed,
+                'deduplicated': self.deduplicated,
+                'expired': self.expired,
+                'evicted': self.evicted,
+                'rejected': self.rejected,
+                'flushed': self.flushed,
+                'pending': len(self._pending),
+                'waits': waits,
+            }
+
+
+# Test function
+def test_speech_scheduler():
+    """Priorities, dedupe, bounding and expiry with a fake voice"""
+    print("\n" + "=" * 60)
+    print("TESTING SPEECH SCHEDULER")
+    print("=" * 60)
+
+    said = []
+
+    def say(text, stream):
+        time.sleep(0.2)
+        said.append(text)
+        return True
+
+    scheduler = SpeechScheduler(say, max_pending=4, ttls={'chatter': 0.3})
+    scheduler.submit("first")
+    time.sleep(0.05)
+    scheduler.submit("just chatting", 'chatter')
+    scheduler.submit("your answer")
+    scheduler.submit("your answer")
+    scheduler.submit("more chatter", 'chatter')
+    scheduler.submit("timer done", 'alert')
+    scheduler.speak("last answer")
+
+    print(f"\n1. Spoken in order: {said}")
+    for row in scheduler.history:
+        print(f"   {row['outcome']:<9} {row['priority']:<8} {row['wait_ms']:>7.1f} ms  {row['text']}")
+    print(f"2. Stats: {scheduler.stats()}")
+    scheduler.stop()
+
+    print("\n" + "=" * 60)
+    print("Speech scheduler test complete!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_speech_scheduler()
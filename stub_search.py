@@ -0,0 +1,26 @@
+class StubInternetSearch:
+    """
+    InternetSearch stand-in that answers instantly and offline
+    Used by the benchmarks (so only our own CPU time is measured), batch runs and headless replays
+    """
+
+    def get_time_date(self):
+        return "The current time is 11:30 PM on Thursday, January 01, 2026"
+
+    def get_weather_basic(self, city="your location"):
+        return f"Weather in {city}: ☀️ +25°C"
+
+    def get_news_basic(self):
+        return "Top world news: Technology advances"
+
+    def search_web_simple(self, query):
+        return f"According to web search: {query}"
+
+    def calculate(self, expression):
+        return f"The result is {expression}"
+
+    def get_joke(self):
+        return "Why did the computer go to the doctor? Because it had a virus!"
+
+    def close(self):
+        pass
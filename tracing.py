@@ -0,0 +1,214 @@
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+
+DEFAULT_TRACE_PATH = os.path.join(os.path.expanduser("~"), ".niley", "traces.jsonl")
+
+
+class _NullSpan:
+    """Shared do-nothing span handed out while tracing is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """Times one stage of a turn and writes it to the trace file on exit"""
+
+    def __init__(self, tracer, stage, attrs):
+        self.tracer = tracer
+        self.stage = stage
+        self.attrs = attrs
+        self.turn_id = tracer.turn_id
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed_ms = (time.perf_counter() - self._start) * 1000
+        record = {
+            'ts': round(time.time(), 3),
+            'turn': self.turn_id,
+            'stage': self.stage,
+            'ms': round(elapsed_ms, 3),
+            'ok': exc_type is None,
+        }
+        record.update(self.attrs)
+        self.tracer._write(record)
+        return False
+
+    def set(self, **attrs):
+        """Attach extra fields, e.g. whether a cache was hit"""
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    """Per-turn latency spans written to a rotating JSONL file"""
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.max_bytes = 5 * 1024 * 1024
+        self.backup_count = 3
+
+        self._file = None
+        self._lock = threading.Lock()
+        # Each thread has its own current turn, so background work isn't tagged with one by accident
+        self._local = threading.local()
+
+    @property
+    def turn_id(self):
+        """ID of the turn the calling thread is working on, or None"""
+        return getattr(self._local, 'turn_id', None)
+
+    @turn_id.setter
+    def turn_id(self, turn_id):
+        self._local.turn_id = turn_id
+
+    def enable(self, path=DEFAULT_TRACE_PATH, max_bytes=5 * 1024 * 1024, backup_count=3):
+        """Start writing spans to path"""
+        with self._lock:
+            self.path = path
+            self.max_bytes = max_bytes
+            self.backup_count = backup_count
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self._file = open(path, 'a', encoding='utf-8')
+            self.enabled = True
+        print(f"📈 Tracing to {path}")
+
+    def disable(self):
+        """Stop tracing and close the file"""
+        with self._lock:
+            self.enabled = False
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def new_turn(self):
+        """Start a new turn; later spans are tagged with its ID"""
+        self.turn_id = uuid.uuid4().hex[:12] if self.enabled else None
+        return self.turn_id
+
+    def end_turn(self):
+        """Stop tagging this thread's spans with a turn"""
+        self.turn_id = None
+
+    def bind(self, func):
+        """Wrap func so it runs under the caller's turn on whatever thread calls it"""
+        turn_id = self.turn_id
+
+        def run(*args, **kwargs):
+            previous = self.turn_id
+            self.turn_id = turn_id
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.turn_id = previous
+        return run
+
+    def span(self, stage, **attrs):
+        """Context manager timing one stage (a shared no-op when tracing is off)"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, stage, attrs)
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            if not self._file:
+                return
+            self._file.write(line)
+            self._file.flush()
+            if self._file.tell() >= self.max_bytes:
+                self._rotate()
+
+    def _rotate(self):
+        """traces.jsonl -> traces.jsonl.1 -> ... (called with the lock held)"""
+        self._file.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+
+# Process-wide tracer used by every module
+tracer = Tracer()
+
+
+def load_spans(path=DEFAULT_TRACE_PATH, backup_count=3):
+    """Read spans from the trace file and its rotated backups, oldest first"""
+    paths = [f"{path}.{index}" for index in range(backup_count, 0, -1)] + [path]
+    spans = []
+    for trace_path in paths:
+        if not os.path.exists(trace_path):
+            continue
+        with open(trace_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    spans.append(json.loads(line))
+                except ValueError:
+                    continue
+    return spans
+
+
+def summarize(spans):
+    """Per-stage count and latency percentiles in milliseconds"""
+    by_stage = {}
+    for span in spans:
+        by_stage.setdefault(span['stage'], []).append(span['ms'])
+
+    def percentile(values, pct):
+        return values[min(int(len(values) * pct / 100), len(values) - 1)]
+
+    summary = {}
+    for stage, values in by_stage.items():
+        values.sort()
+        summary[stage] = {
+            'count': len(values),
+            'p50': percentile(values, 50),
+            'p90': percentile(values, 90),
+            'p99': percentile(values, 99),
+            'max': values[-1],
+        }
+    return summary
+
+
+def print_summary(path=DEFAULT_TRACE_PATH):
+    """Print per-stage percentiles for a trace file"""
+    spans = load_spans(path)
+    turns = {span['turn'] for span in spans if span.get('turn')}
+    print("\n" + "=" * 60)
+    print(f"📈 TRACE SUMMARY: {len(spans)} spans, {len(turns)} turns")
+    print("=" * 60)
+    print(f"{'stage':<12} {'count':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for stage, stats in sorted(summarize(spans).items(), key=lambda item: -item[1]['p50']):
+        print(f"{stage:<12} {stats['count']:>7} {stats['p50']:>9.1f} {stats['p90']:>9.1f} "
+              f"{stats['p99']:>9.1f} {stats['max']:>9.1f}")
+
+
+if __name__ == "__main__":
+    # python tracing.py summary [path]
+    if len(sys.argv) >= 2 and sys.argv[1] == "summary":
+        print_summary(sys.argv[2] if len(sys.argv) > 2 else DEFAULT_TRACE_PATH)
+    else:
+        print("Usage: python tracing.py summary [path]")
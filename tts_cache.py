@@ -0,0 +1,196 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".niley", "tts_cache")
+
+
+class TTSCache:
+    """Content-addressed on-disk cache for synthesized speech (LRU, size-bounded)"""
+
+    # A .part file this old was left by a writer that crashed before os.replace()
+    STALE_PART_SECONDS = 10 * 60
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=50 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size in bytes, oldest first
+        self._total_bytes = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(text, lang='en', slow=False):
+        """Stable key for a (text, lang, slow) triple"""
+        raw = f"{lang}\x00{int(bool(slow))}\x00{text.strip()}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.mp3")
+
+    def _load_index(self):
+        """Rebuild the LRU order from the files already on disk, deleting abandoned temp files"""
+        files = []
+        cutoff = time.time() - self.STALE_PART_SECONDS
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(('.mp3', '.part')):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+                if name.endswith('.part'):
+                    # Recent ones may belong to another process writing right now
+                    if stat.st_mtime < cutoff:
+                        os.remove(path)
+                    continue
+            except OSError:
+                continue
+            files.append((stat.st_mtime, name[:-4], stat.st_size))
+
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._total_bytes += size
+
+        self._evict()
+
+    def get(self, text, lang='en', slow=False):
+        """Return the path of the cached MP3, or None on a miss"""
+        key = self.make_key(text, lang, slow)
+        path = self._path(key)
+
+        with self._lock:
+            if key in self._entries and os.path.exists(path):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                try:
+                    os.utime(path, None)  # keep LRU order across restarts
+                except OSError:
+                    pass
+                return path
+
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self.misses += 1
+            return None
+
+    def get_bytes(self, text, lang='en', slow=False):
+        """Return the cached MP3 bytes, or None on a miss"""
+        path = self.get(text, lang, slow)
+        if not path:
+            return None
+        try:
+            with open(path, 'rb') as fp:
+                return fp.read()
+        except OSError:
+            return None
+
+    def put(self, text, data, lang='en', slow=False):
+        """Atomically store MP3 bytes and return the cached path"""
+        key = self.make_key(text, lang, slow)
+        path = self._path(key)
+
+        fd, temp_path = tempfile.mkstemp(suffix='.part', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(data)
+            os.replace(temp_path, path)
+        except Exception:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict(keep=key)
+
+        return path
+
+    def _evict(self, keep=None):
+        """Drop least recently used entries until under max_bytes"""
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = next(iter(self._entries.items()))
+            if key == keep:
+                if len(self._entries) == 1:
+                    break
+                self._entries.move_to_end(key)
+                continue
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # File is still open somewhere (Windows), try again later
+                self._entries.move_to_end(key)
+                break
+            del self._entries[key]
+            self._total_bytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        """Remove every cached file"""
+        with self._lock:
+            for key in list(self._entries):
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+
+# Test function
+def test_tts_cache():
+    """Test TTS cache"""
+    print("\n" + "=" * 60)
+    print("TESTING TTS CACHE")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = TTSCache(cache_dir=cache_dir, max_bytes=2048)
+
+        print(f"\n1. Miss: {cache.get('How can I help you?')}")
+        path = cache.put('How can I help you?', b'\x00' * 1024)
+        print(f"2. Stored: {os.path.basename(path)}")
+        print(f"3. Hit: {cache.get('How can I help you?') == path}")
+
+        cache.put('Are you there?', b'\x00' * 1024)
+        cache.put('Resting now.', b'\x00' * 1024)
+        print(f"4. After eviction: {cache.get('How can I help you?')}")
+        print(f"5. Stats: {cache.stats()}")
+
+    print("\n" + "=" * 60)
+    print("TTS cache test complete!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_tts_cache()
@@ -1,35 +1,403 @@
 import speech_recognition as sr
-import pyttsx3
-from gtts import gTTS
-import pygame
-import os
-import tempfile
 import time
 import threading
 import queue
 import random
+import io
+import re
+from collections import namedtuple, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from tts_cache import TTSCache
+from audio_capture import AudioCapture, BargeInDetector, VoiceActivityGate, NoiseFloorTracker
+from recognizers import GoogleBackend, RecognitionError, make_backend
+from speech_scheduler import SpeechScheduler
+from tracing import tracer
+
+
+WakeWordMatch = namedtuple('WakeWordMatch', ['word', 'prefix', 'suffix', 'offset'])
+
+
+class WakeWordMatcher:
+    """Token trie over the wake words, built once and matched on whole words"""
+
+    PREFIXES = ["hey", "hi", "hello", "okay", "ok", "merhaba", "selam", "wake up"]
+    SUFFIXES = ["wake up", "are you there"]
+
+    _END = object()
+    _token_regex = re.compile(r"\w+")
+
+    def __init__(self, wake_words, prefixes=None, suffixes=None):
+        self.wake_words = tuple(wake_words)
+
+        # Trie keyed by lowercase tokens; the leaf stores the configured spelling
+        self._trie = {}
+        for wake_word in self.wake_words:
+            tokens = self._token_regex.findall(wake_word.lower())
+            if not tokens:
+                continue
+            node = self._trie
+            for token in tokens:
+                node = node.setdefault(token, {})
+            node.setdefault(self._END, wake_word)
+
+        # Longest phrases first so "wake up" wins over a shorter overlap
+        self._prefixes = self._phrases(self.PREFIXES if prefixes is None else prefixes)
+        self._suffixes = self._phrases(self.SUFFIXES if suffixes is None else suffixes)
+
+    def _phrases(self, phrases):
+        tokenized = {tuple(self._token_regex.findall(p.lower())) for p in phrases}
+        return sorted((p for p in tokenized if p), key=len, reverse=True)
+
+    def match(self, text):
+        """Return the first WakeWordMatch in text, or None"""
+        if not text:
+            return None
+
+        spans = [(m.group().lower(), m.start()) for m in self._token_regex.finditer(text)]
+        tokens = [token for token, _ in spans]
+
+        for start in range(len(tokens)):
+            node = self._trie
+            found = None
+            end = start
+            # Walk the trie as far as the text allows, keep the longest wake word
+            while end < len(tokens) and tokens[end] in node:
+                node = node[tokens[end]]
+                end += 1
+                if self._END in node:
+                    found = (node[self._END], end)
+
+            if found:
+                word, end = found
+                prefix = next((p for p in self._prefixes
+                               if len(p) <= start and tuple(tokens[start - len(p):start]) == p), ())
+                suffix = next((s for s in self._suffixes
+                               if tuple(tokens[end:end + len(s)]) == s), ())
+                return WakeWordMatch(word, " ".join(prefix), " ".join(suffix), spans[start][1])
+
+        return None
+
+
+class PlaybackHandle:
+    """
+    One utterance queued on an AudioOutput
+    wait() blocks until it ends and returns whether anything played; cancel() cuts it off
+    """
+
+    def __init__(self, output, sounds):
+        self.output = output
+        self.sounds = sounds
+        self.future = Future()
+        self.queued_at = time.monotonic()
+        self.started_at = None
+        self.ended_at = None
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Stop this utterance (within one mixer buffer if it is playing); True if it hadn't ended"""
+        return self.output.cancel(self)
+
+    def done(self):
+        return self.future.done()
+
+    def wait(self, timeout=None):
+        return self.future.result(timeout)
+
+    def add_done_callback(self, fn):
+        """Call fn(handle) on the output thread when playback ends, or now if it already has"""
+        self.future.add_done_callback(lambda _: fn(self))
+
+
+class AudioOutput:
+    """
+    pygame mixer opened once with a channel reserved for speech, fed by one player thread
+    Decoded clips are kept in memory, so a repeated phrase starts without an MP3 decode
+    """
+
+    def __init__(self, frequency=22050, buffer=512, max_clips=48):
+        self.frequency = frequency
+        self.buffer = buffer
+        # How long the mixer takes to act on a stop()
+        self.buffer_seconds = buffer / frequency
+        self.max_clips = max_clips
+
+        self.channel = None
+        self.init_seconds = None
+        self._ready = threading.Event()
+        self._error = None
+
+        self._clips = OrderedDict()
+        self._clips_lock = threading.Lock()
+        self.clip_hits = 0
+        self.clip_misses = 0
+
+        self._pending = queue.Queue()
+        self._current = None
+        # Held while starting a sound and while cancelling, so a cancel can't slip in between
+        self._channel_lock = threading.Lock()
+        self._thread = None
+
+        self.played = 0
+        self.cancelled = 0
+        self.started = 0
+        self.total_start_ms = 0.0
+        self.max_start_ms = 0.0
+
+    def open(self):
+        """Open the mixer on a background thread and start the player"""
+        threading.Thread(target=self._init_mixer, name="mixer-init", daemon=True).start()
+        self._thread = threading.Thread(target=self._run, name="audio-output", daemon=True)
+        self._thread.start()
+
+    def _init_mixer(self):
+        """Import pygame and open the mixer (channel 0 is reserved for speech)"""
+        start = time.perf_counter()
+        try:
+            import pygame
+            pygame.mixer.init(frequency=self.frequency, size=-16, channels=2, buffer=self.buffer)
+            pygame.mixer.set_reserved(1)
+            self.channel = pygame.mixer.Channel(0)
+        except Exception as e:
+            self._error = e
+        finally:
+            self.init_seconds = time.perf_counter() - start
+            self._ready.set()
+
+    def wait_ready(self):
+        """Block until the mixer is open; re-raise its init error if it failed"""
+        self._ready.wait()
+        if self._error:
+            raise self._error
+
+    def decode(self, data):
+        """Decode MP3 bytes into a mixer Sound without touching the filesystem"""
+        import pygame
+
+        self.wait_ready()
+        return pygame.mixer.Sound(file=io.BytesIO(data))
+
+    def clip(self, key):
+        """A decoded clip kept by load(), or None"""
+        with self._clips_lock:
+            sound = self._clips.get(key)
+            if sound is None:
+                self.clip_misses += 1
+                return None
+            self._clips.move_to_end(key)
+            self.clip_hits += 1
+            return sound
+
+    def load(self, key, data):
+        """Decode data and keep it under key (least recently used clips are evicted)"""
+        sound = self.decode(data)
+        with self._clips_lock:
+            self._clips[key] = sound
+            self._clips.move_to_end(key)
+            while len(self._clips) > self.max_clips:
+                self._clips.popitem(last=False)
+        return sound
+
+    def play(self, sounds):
+        """
+        Queue decoded sounds as one utterance; returns its handle
+        sounds is a list, or a queue.Queue filled while playing and ended with None
+        """
+        handle = PlaybackHandle(self, sounds)
+        self._pending.put(handle)
+        return handle
+
+    def cancel(self, handle=None):
+        """Cancel one utterance, or everything playing and queued when handle is None"""
+        if handle is None:
+            # Queued handles are skipped by the player once flagged
+            with self._pending.mutex:
+                queued = [item for item in self._pending.queue if item is not None]
+            for item in queued:
+                item._cancelled.set()
+            handle = self._current
+            if handle is None:
+                return False
+
+        with self._channel_lock:
+            if handle.done() or handle.cancelled:
+                return False
+            handle._cancelled.set()
+            if handle is self._current and self.channel:
+                self.channel.stop()
+        return True
+
+    def _run(self):
+        while True:
+            handle = self._pending.get()
+            if handle is None:
+                return
+            if handle.cancelled:
+                self._finish(handle, False)
+                continue
+
+            self._current = handle
+            try:
+                played = self._play(handle)
+            except Exception as e:
+                self._current = None
+                handle.ended_at = time.monotonic()
+                handle.future.set_exception(e)
+                continue
+            self._current = None
+            self._finish(handle, played)
+
+    def _finish(self, handle, played):
+        handle.ended_at = time.monotonic()
+        if handle.cancelled:
+            self.cancelled += 1
+        elif played:
+            self.played += 1
+        handle.future.set_result(played)
+
+    def _start(self, handle, sound, queue_it):
+        """Play or queue sound unless the handle was cancelled; False if it was"""
+        with self._channel_lock:
+            if handle.cancelled:
+                return False
+            if queue_it:
+                self.channel.queue(sound)
+            else:
+                self.channel.play(sound)
+        return True
+
+    def _play(self, handle):
+        """Play the handle's sounds back to back; blocks until the last ends or it is cancelled"""
+        self.wait_ready()
+        channel = self.channel
+        cancelled = handle._cancelled
+
+        sounds = handle.sounds
+        if isinstance(sounds, queue.Queue):
+            sounds = self._pull(sounds, cancelled)
+
+        played_any = False
+        taken_at = ends_at = time.monotonic()
+        for sound in sounds:
+            if cancelled.is_set():
+                break
+
+            if played_any and channel.get_busy():
+                # Gapless: the mixer starts the queued sound as soon as the current ends
+                if not self._start(handle, sound, queue_it=True):
+                    break
+                starts_at = ends_at
+                ends_at += sound.get_length()
+                # Only one sound can be queued, so wait until this one has started
+                if cancelled.wait(max(starts_at - time.monotonic(), 0)):
+                    break
+            else:
+                if not self._start(handle, sound, queue_it=False):
+                    break
+                ends_at = time.monotonic() + sound.get_length()
+                if not played_any:
+                    # play() replaces whatever a cancelled utterance left on the channel
+                    handle.started_at = time.monotonic()
+                    # Synthesis/decoding of lazy sounds, not time spent behind other utterances
+                    start_ms = (handle.started_at - taken_at) * 1000
+                    self.started += 1
+                    self.total_start_ms += start_ms
+                    self.max_start_ms = max(self.max_start_ms, start_ms)
+            played_any = True
+
+        # Completion is known from the clip lengths, so wait on the event, not the mixer
+        cancelled.wait(max(ends_at - time.monotonic(), 0))
+        return played_any
+
+    def _pull(self, source, cancelled):
+        """Sounds from a queue as they arrive; a cancel is noticed within one buffer while waiting"""
+        while not cancelled.is_set():
+            try:
+                sound = source.get(timeout=self.buffer_seconds)
+            except queue.Empty:
+                continue
+            if sound is None:
+                return
+            yield sound
+
+    @property
+    def is_playing(self):
+        return self._current is not None
+
+    def close(self):
+        """Cancel everything, stop the player and close the mixer"""
+        self.cancel()
+        self._pending.put(None)
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2)
+        if self.channel:
+            import pygame
+            pygame.mixer.quit()
+
+    def stats(self):
+        """Utterances played and cancelled, time from dequeue to first sound, clip cache hits"""
+        return {
+            'played': self.played,
+            'cancelled': self.cancelled,
+            'avg_start_ms': self.total_start_ms / self.started if self.started else 0.0,
+            'max_start_ms': self.max_start_ms,
+            'clips': len(self._clips),
+            'clip_hits': self.clip_hits,
+            'clip_misses': self.clip_misses,
+        }
 
 
 class VoiceEngine:
-    def __init__(self, assistant_name="Niley", use_gtts=True, wake_words=None):
+    def __init__(self, assistant_name="Niley", use_gtts=True, wake_words=None, tts_cache=None,
+                 stream_threshold=120, continuous_listening=True, vad_gate=None,
+                 recognizer_backends=None, audio_source=None, audio_sink=None, barge_in=True):
         if wake_words is None:
             wake_words = ["niley", "N", "alexa", "siri", "na", "Nelly", "milo"
                 , "naahi lla", "nil", "kizim", "niall", "Miley", "Nai", "nale", "noi", "Laila", "Nelly","janim","sanam","Jaana","jannu","honey","sweetie","baby"]
         self.assistant_name = assistant_name
         self.use_gtts = use_gtts
         self.wake_words = wake_words  # List of wake words
+        self.tts_lang = 'en'
+        self.tts_slow = False
+        # Responses longer than this are synthesized and played chunk by chunk
+        self.stream_threshold = stream_threshold
+
+        # Cache synthesized phrases on disk so repeats skip the network
+        if tts_cache is None:
+            try:
+                tts_cache = TTSCache()
+            except OSError as e:
+                print(f"⚠️  TTS cache disabled: {e}")
+        self.tts_cache = tts_cache
+
+        # Seconds spent in each startup phase
+        self.startup_timings = {}
+        init_start = time.perf_counter()
 
-        # Initialize pygame
-        pygame.mixer.init(frequency=22050, size=-16, channels=2, buffer=512)
+        # Open the mixer on its own thread while the microphone calibrates
+        # Replaces pygame/pyttsx3 output when set (e.g. replay.NullSink for headless runs)
+        self.audio_sink = audio_sink
+        self.output = None
+        if audio_sink is None:
+            self.output = AudioOutput()
+            self.output.open()
 
-        # Initialize speech recognition
+        # Initialize speech recognition (audio_source replaces the microphone, e.g. replay.ReplaySource)
         self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
+        self.microphone = sr.Microphone() if audio_source is None else None
+
+        # Speech-to-text per mode: {'wake': ..., 'command': ...}, each a backend name, instance
+        # or list tried in order when one fails (e.g. ['google', 'vosk'])
+        self.recognizer_backends = self._make_backends(recognizer_backends or {})
 
         # Initialize pyttsx3 as fallback
         self.engine = None
         if not use_gtts:
             try:
+                import pyttsx3
                 self.engine = pyttsx3.init()
                 voices = self.engine.getProperty('voices')
                 if len(voices) > 1:
@@ -103,14 +471,74 @@ class VoiceEngine:
             "Okay, I'm going to sleep.",
         ]
 
-        # Adjust microphone
-        self._adjust_microphone()
-
-        # Speech queue
-        self.speech_queue = queue.Queue()
+        # Every phrase, waited on or not, goes through one scheduler so outputs never overlap
         self.is_speaking = False
-        self.speech_thread = threading.Thread(target=self._speech_worker, daemon=True)
-        self.speech_thread.start()
+        self._speech_ended_at = 0.0
+        self.speech = SpeechScheduler(self._say, interrupt=self.stop_playback)
+
+        # Recognition runs on workers so capture never waits for the network
+        self._recognition_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="recognize")
+        # Phrases heard right after the wake word, handed to the next listen()
+        self._carryover = []
+
+        # Keep the microphone open and capturing for the whole session
+        microphone_start = time.perf_counter()
+        self.noise_tracker = None
+        self.barge_in = None
+        if audio_source is not None:
+            self.capture = audio_source
+        else:
+            # The threshold follows the room from the live stream instead of a blocking calibration
+            self.noise_tracker = NoiseFloorTracker(self.recognizer)
+            # Keep listening while we talk, so the user can cut a long answer short
+            if barge_in and self.output:
+                self.barge_in = BargeInDetector(self.recognizer, is_active=lambda: self.output.is_playing,
+                                                on_barge_in=self._on_barge_in)
+            self.capture = AudioCapture(self.recognizer, self.microphone, is_muted=self._overlaps_speech,
+                                        noise_tracker=self.noise_tracker, barge_in=self.barge_in)
+        if continuous_listening or audio_source is not None:
+            try:
+                if self.noise_tracker and self.noise_tracker.load():
+                    print(f"🎤 Using saved noise threshold {self.recognizer.energy_threshold:.0f}")
+                self.capture.start(calibrate_duration=0 if self.noise_tracker else 1)
+                print("✅ Microphone ready! (continuous capture)")
+            except Exception as e:
+                print(f"⚠️  Continuous capture unavailable: {e}")
+        if not self.capture.running and self.microphone:
+            self._adjust_microphone()
+        self.startup_timings['microphone'] = time.perf_counter() - microphone_start
+
+        # Local voice-activity check before sleep-mode phrases go to the cloud (False disables)
+        self.vad_gate = vad_gate if vad_gate is not None else VoiceActivityGate()
+
+        if self.output:
+            self.output.wait_ready()
+            self.startup_timings['mixer'] = self.output.init_seconds
+            # Decode the stock replies now so they start playing the moment they're needed
+            if self.tts_cache:
+                threading.Thread(target=self.preload_clips, args=(self._stock_phrases(),),
+                                 name="preload-clips", daemon=True).start()
+        self.startup_timings['total'] = time.perf_counter() - init_start
+
+    def _stock_phrases(self):
+        """Replies spoken word for word, worth keeping decoded"""
+        phrases = [phrase for responses in self.wake_responses.values() for phrase in responses]
+        return list(dict.fromkeys(phrases + self.sleep_messages))
+
+    def preload_clips(self, phrases):
+        """Decode phrases already in the TTS cache into memory (never synthesizes); returns the count"""
+        loaded = 0
+        for text in phrases:
+            key = (text, self.tts_lang, self.tts_slow)
+            data = self.tts_cache.get_bytes(text, self.tts_lang, self.tts_slow)
+            if not data:
+                continue
+            try:
+                self.output.load(key, data)
+                loaded += 1
+            except Exception as e:
+                print(f"⚠️  Could not preload '{text[:30]}': {e}")
+        return loaded
 
     def _adjust_microphone(self):
         """Adjust microphone for ambient noise"""
@@ -122,31 +550,141 @@ class VoiceEngine:
         except Exception as e:
             print(f"⚠️  Microphone: {e}")
 
+    def _synthesize_gtts(self, text):
+        """Return MP3 bytes for text, synthesizing only on a cache miss"""
+        with tracer.span('synthesize', chars=len(text)) as span:
+            if self.tts_cache:
+                cached = self.tts_cache.get_bytes(text, self.tts_lang, self.tts_slow)
+                if cached:
+                    span.set(cached=True)
+                    return cached
+
+            from gtts import gTTS
+
+            buffer = io.BytesIO()
+            tts = gTTS(text=text, lang=self.tts_lang, slow=self.tts_slow)
+            tts.write_to_fp(buffer)
+            data = buffer.getvalue()
+            span.set(cached=False)
+
+        if self.tts_cache:
+            try:
+                self.tts_cache.put(text, data, self.tts_lang, self.tts_slow)
+            except OSError as e:
+                print(f"⚠️  TTS cache write failed: {e}")
+
+        return data
+
+    def _clip_for(self, text):
+        """Decoded sound for a whole phrase, synthesized and decoded only the first time"""
+        key = (text, self.tts_lang, self.tts_slow)
+        return self.output.clip(key) or self.output.load(key, self._synthesize_gtts(text))
+
+    def _play_sounds(self, sounds):
+        """
+        Play decoded sounds back to back on the speech channel
+        Blocks until the last one ends or stop_playback() is called
+        """
+        with tracer.span('playback'):
+            return self.output.play(sounds).wait()
+
+    def stop_playback(self):
+        """Interrupt whatever is playing or queued on the speech channel"""
+        if self.output:
+            self.output.cancel()
+
+    def _on_barge_in(self, onset):
+        """The user spoke over playback: stop talking; their phrase becomes the next command"""
+        self.speech.flush(('answer', 'chatter'))
+        self.stop_playback()
+        print("\n✋ Interrupted")
+
+    def _overlaps_speech(self, started_at, ended_at):
+        """True if captured audio may contain our own voice"""
+        return self.is_speaking or started_at < self._speech_ended_at
+
     def _speak_gtts(self, text):
         """Use Google Text-to-Speech"""
         try:
-            with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as fp:
-                temp_file = fp.name
+            return self._play_sounds([self._clip_for(text)])
 
-            tts = gTTS(text=text, lang='en', slow=False)
-            tts.save(temp_file)
+        except Exception as e:
+            print(f"⚠️  gTTS error: {e}")
+            return False
 
-            pygame.mixer.music.load(temp_file)
-            pygame.mixer.music.play()
+    @staticmethod
+    def split_for_streaming(text, max_chars=200, min_chars=40):
+        """Split text into sentence/clause chunks small enough to synthesize quickly"""
+        pieces = []
+        for sentence in re.split(r'(?<=[.!?])\s+|\n+', text):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            if len(sentence) <= max_chars:
+                pieces.append(sentence)
+                continue
 
-            while pygame.mixer.music.get_busy():
-                time.sleep(0.1)
+            # Long sentence: break on clauses, then on words
+            current = ""
+            for clause in re.split(r'(?<=[,;:])\s+', sentence):
+                for word in clause.split():
+                    if current and len(current) + len(word) + 1 > max_chars:
+                        pieces.append(current)
+                        current = word
+                    else:
+                        current = f"{current} {word}" if current else word
+                if len(current) >= min_chars:
+                    pieces.append(current)
+                    current = ""
+            if current:
+                pieces.append(current)
 
-            pygame.mixer.music.unload()
-            time.sleep(0.1)
-            os.remove(temp_file)
+        # Merge short pieces so we don't pay a request per bullet point
+        chunks = []
+        for piece in pieces:
+            if chunks and len(chunks[-1]) < min_chars and len(chunks[-1]) + len(piece) < max_chars:
+                chunks[-1] = f"{chunks[-1]} {piece}"
+            else:
+                chunks.append(piece)
+        return chunks
 
-            return True
+    def _speak_gtts_streaming(self, text):
+        """Synthesize chunk N+1 while chunk N plays, queued on one channel"""
+        chunks = self.split_for_streaming(text)
+        ready = queue.Queue(maxsize=2)
+        stop_event = threading.Event()
 
-        except Exception as e:
-            print(f"⚠️  gTTS error: {e}")
+        def offer(item):
+            # Give up instead of blocking forever once playback is over
+            while not stop_event.is_set():
+                try:
+                    ready.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
             return False
 
+        def produce():
+            for chunk in chunks:
+                if stop_event.is_set():
+                    return
+                try:
+                    sound = self.output.decode(self._synthesize_gtts(chunk))  # decoded up front
+                except Exception as e:
+                    print(f"⚠️  gTTS error: {e}")
+                    break
+                if not offer(sound):
+                    return
+            offer(None)
+
+        threading.Thread(target=tracer.bind(produce), name="tts-stream", daemon=True).start()
+
+        try:
+            return self._play_sounds(ready)
+        finally:
+            # A cancelled stream returns at once; the producer exits after its current chunk
+            stop_event.set()
+
     def _speak_pyttsx3(self, text):
         """Use pyttsx3 (offline)"""
         try:
@@ -158,110 +696,178 @@ class VoiceEngine:
             print(f"⚠️  pyttsx3 error: {e}")
         return False
 
-    def _speech_worker(self):
-        """Background thread for speech synthesis"""
-        while True:
-            text = self.speech_queue.get()
-            if text is None:
-                break
+    def _say(self, text, stream=None):
+        """Speak text now on the calling thread, falling back to pyttsx3"""
+        print("\n" + "=" * 40)
+        print(f"🎙️  {self.assistant_name.upper()}: {text}")
+        print("=" * 40)
 
-            self.is_speaking = True
-            print("\n" + "=" * 40)
-            print(f"🎙️  {self.assistant_name.upper()}: {text}")
-            print("=" * 40)
+        if stream is None:
+            stream = len(text) > self.stream_threshold
 
+        self.is_speaking = True
+        try:
             success = False
-            if self.use_gtts:
-                success = self._speak_gtts(text)
+            if self.audio_sink:
+                success = self.audio_sink.speak(text)
+            elif self.use_gtts:
+                if stream:
+                    success = self._speak_gtts_streaming(text)
+                else:
+                    success = self._speak_gtts(text)
 
             if not success and self.engine:
                 success = self._speak_pyttsx3(text)
 
             if not success:
                 print(f"⚠️  Could not speak: {text[:50]}...")
-
+            return success
+        finally:
             self.is_speaking = False
-            self.speech_queue.task_done()
+            self._speech_ended_at = time.monotonic()
 
-    def speak(self, text, wait=False):
-        """Convert text to speech"""
+    def speak(self, text, wait=False, stream=None, priority='answer', ttl=None):
+        """
+        Convert text to speech
+        stream=None streams automatically for text longer than stream_threshold
+        priority is 'alert', 'answer' or 'chatter'; ttl overrides how long it may wait to be said
+        With wait=True returns whether it was spoken, otherwise a Future of that
+        """
         if wait:
-            print("\n" + "=" * 40)
-            print(f"🎙️  {self.assistant_name.upper()}: {text}")
-            print("=" * 40)
-
-            if self.use_gtts:
-                self._speak_gtts(text)
-            elif self.engine:
-                self._speak_pyttsx3(text)
-        else:
-            self.speech_queue.put(text)
+            return self.speech.speak(text, priority, stream, ttl)
+        return self.speech.submit(text, priority, stream, ttl)
 
-    def listen(self, timeout=5, phrase_time_limit=8):
-        """Listen for voice input"""
-        with self.microphone as source:
+    def _make_backends(self, specs):
+        """Build the per-mode backend lists, skipping engines that can't load here"""
+        backends = {}
+        for mode in ('wake', 'command'):
+            spec = specs.get(mode, 'google')
+            chain = []
+            for item in spec if isinstance(spec, (list, tuple)) else [spec]:
+                try:
+                    chain.append(make_backend(item, self.recognizer))
+                except (RecognitionError, ValueError) as e:
+                    # Missing engine, or a misspelled name in the config
+                    print(f"⚠️  {item} recognizer unavailable for {mode} mode: {e}")
+            if not chain:
+                print(f"   Using Google recognition for {mode} mode")
+                chain.append(GoogleBackend(self.recognizer))
+            backends[mode] = chain
+        return backends
+
+    def _recognize(self, audio, verbose=True, mode='command'):
+        """Turn captured audio into lowercase text, or None"""
+        if verbose:
+            print("✅ Processing...")
+
+        text = None
+        for backend in self.recognizer_backends[mode]:
             try:
-                print("\n🔊 Listening...")
-                audio = self.recognizer.listen(
-                    source,
-                    timeout=timeout,
-                    phrase_time_limit=phrase_time_limit
-                )
+                with tracer.span('recognize', backend=backend.name, mode=mode):
+                    text = backend.recognize(audio)
+                break
+            except RecognitionError:
+                # Try the next backend (e.g. offline after the cloud)
+                print("🌐 Check internet" if not backend.offline else f"⚠️  {backend.name} recognizer failed")
+            except Exception as e:
+                print(f"⚠️  Error: {e}")
+                return None
 
-                print("✅ Processing...")
-                text = self.recognizer.recognize_google(audio)
+        if not text:
+            if verbose:
+                print("❓ Could not understand")
+            return None
 
+        if verbose:
+            print("\n" + "─" * 40)
+            print(f"👤 YOU: {text}")
+            print("─" * 40)
+        return text.lower()
+
+    def recognition_stats(self):
+        """Latency counters for every backend in use"""
+        seen = {}
+        for chain in self.recognizer_backends.values():
+            for backend in chain:
+                seen[id(backend)] = backend
+        return [backend.stats() for backend in seen.values()]
+
+    def listen(self, timeout=5, phrase_time_limit=8, mode='command'):
+        """Listen for voice input"""
+        while self._carryover:
+            text = self._carryover.pop(0).result()
+            if text:
                 print("\n" + "─" * 40)
                 print(f"👤 YOU: {text}")
                 print("─" * 40)
-                return text.lower()
+                return text
 
-            except sr.WaitTimeoutError:
+        if self.capture.running:
+            print("\n🔊 Listening...")
+            self.capture.phrase_time_limit = phrase_time_limit
+            # timeout is for speech to start, the phrase itself may then run phrase_time_limit
+            with tracer.span('listen'):
+                audio = self.capture.get_phrase(timeout=timeout + phrase_time_limit)
+            if audio is None:
                 print(" No speech")
                 return None
-            except sr.UnknownValueError:
-                print("❓ Could not understand")
-                return None
-            except sr.RequestError:
-                print("🌐 Check internet")
+            return self._recognize(audio, mode=mode)
+
+        with self.microphone as source:
+            try:
+                print("\n🔊 Listening...")
+                with tracer.span('listen'):
+                    audio = self.recognizer.listen(
+                        source,
+                        timeout=timeout,
+                        phrase_time_limit=phrase_time_limit
+                    )
+            except sr.WaitTimeoutError:
+                print(" No speech")
                 return None
             except Exception as e:
                 print(f"⚠️  Error: {e}")
                 return None
 
+        return self._recognize(audio, mode=mode)
+
+    @property
+    def wake_words(self):
+        return self._wake_words
+
+    @wake_words.setter
+    def wake_words(self, wake_words):
+        """Replace the wake words and rebuild the matcher"""
+        self._wake_words = tuple(wake_words)
+        self._wake_matcher = WakeWordMatcher(self._wake_words)
+
+    def match_wake_word(self, text):
+        """Return a WakeWordMatch (word, prefix, suffix, offset) or None"""
+        return self._wake_matcher.match(text)
+
     def detect_wake_word(self, text):
         """Check if text contains any wake word"""
-        if not text:
-            return None
+        match = self.match_wake_word(text)
+        return match.word if match else None
 
-        text_lower = text.lower()
+    def _wake_word_response(self, match, text):
+        """Announce a detected wake word and return (detected_word, full_text)"""
+        detected_word = match.word
+        print(f"\n" + "✅" * 20)
+        print(f"✅ WAKE WORD '{detected_word.upper()}' DETECTED")
+        if match.prefix or match.suffix:
+            phrase = " ".join(p for p in (match.prefix, detected_word, match.suffix) if p)
+            print(f"   Phrase: '{phrase}'")
+        print("✅" * 20)
 
-        # Build all possible variations
-        variations = []
-        for wake_word in self.wake_words:
-            variations.extend([
-                wake_word,
-                f"hey {wake_word}",
-                f"hi {wake_word}",
-                f"hello {wake_word}",
-                f"okay {wake_word}",
-                f"ok {wake_word}",
-                f"merhaba {wake_word}",
-                f"selam {wake_word}",
-                f"{wake_word} wake up",
-                f"wake up {wake_word}",
-                f"{wake_word} are you there",
-            ])
-
-        # Check each variation
-        for variation in variations:
-            if variation in text_lower:
-                # Extract which wake word was used
-                for wake_word in self.wake_words:
-                    if wake_word in variation:
-                        return wake_word
+        # Get appropriate response
+        if detected_word in self.wake_responses:
+            response = random.choice(self.wake_responses[detected_word])
+        else:
+            response = random.choice(self.wake_responses["default"])
 
-        return None
+        self.speak(response, wait=True)
+        return detected_word, text
 
     def wait_for_wake_word(self, timeout_seconds=None):
         """
@@ -271,6 +877,58 @@ class VoiceEngine:
         wake_word_list = ", ".join([f"'{w}'" for w in self.wake_words])
         print(f"\n Sleep mode: Waiting for wake words...")
 
+        if not self.capture.running:
+            return self._wait_for_wake_word_blocking(timeout_seconds)
+
+        start_time = time.time()
+        self.capture.phrase_time_limit = 2
+        pending = []  # (audio, recognition future), oldest first
+        ticks = 0
+
+        try:
+            while True:
+                # Check timeout
+                if timeout_seconds and (time.time() - start_time) > timeout_seconds:
+                    print(f"\n⏰ Timeout after {timeout_seconds} seconds")
+                    return None, None
+
+                # Hand new phrases to the recognition workers
+                audio = self.capture.get_phrase(timeout=0.25)
+                if audio is not None and self.vad_gate and not self.vad_gate.accept(audio):
+                    audio = None  # noise, a cough or too long to be a wake word
+                if audio is not None:
+                    pending.append((audio, self._recognition_pool.submit(self._recognize, audio, False, 'wake')))
+                else:
+                    # Visual indicator
+                    ticks += 1
+                    if ticks % 20 == 0:
+                        print(".", end="", flush=True)
+
+                # Check results in capture order
+                while pending and pending[0][1].done():
+                    text = pending.pop(0)[1].result()
+                    if not text:
+                        continue
+
+                    match = self.match_wake_word(text)
+                    if match:
+                        # Whatever was said after the wake word is probably the command,
+                        # so recognize it again with the command backends
+                        for _, future in pending:
+                            future.cancel()
+                        self._carryover = [
+                            self._recognition_pool.submit(self._recognize, audio, False, 'command')
+                            for audio, _ in pending
+                        ]
+                        pending = []
+                        return self._wake_word_response(match, text)
+                    print(f"\n   Heard: '{text}' (not a wake word)")
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+    def _wait_for_wake_word_blocking(self, timeout_seconds=None):
+        """Listen/recognize loop used when continuous capture is unavailable"""
         start_time = time.time()
         listen_count = 0
 
@@ -288,25 +946,14 @@ class VoiceEngine:
                 print(".", end="", flush=True)
 
             # Listen
-            text = self.listen(timeout=3, phrase_time_limit=2)
+            text = self.listen(timeout=3, phrase_time_limit=2, mode='wake')
 
             if text:
                 listen_count = 0
-                detected_word = self.detect_wake_word(text)
-
-                if detected_word:
-                    print(f"\n" + "✅" * 20)
-                    print(f"✅ WAKE WORD '{detected_word.upper()}' DETECTED")
-                    print("✅" * 20)
-
-                    # Get appropriate response
-                    if detected_word in self.wake_responses:
-                        response = random.choice(self.wake_responses[detected_word])
-                    else:
-                        response = random.choice(self.wake_responses["default"])
+                match = self.match_wake_word(text)
 
-                    self.speak(response, wait=True)
-                    return detected_word, text
+                if match:
+                    return self._wake_word_response(match, text)
                 else:
                     print(f"\n   Heard: '{text}' (not a wake word)")
 
@@ -320,10 +967,37 @@ class VoiceEngine:
 
     def stop(self):
         """Clean shutdown"""
-        self.speech_queue.put(None)
-        if self.speech_thread.is_alive():
-            self.speech_thread.join(timeout=2)
-        pygame.mixer.quit()
+        self.capture.stop()
+        self._recognition_pool.shutdown(wait=False, cancel_futures=True)
+        self.speech.stop()
+        stats = self.speech.stats()
+        waits = ", ".join(f"{priority} avg {wait['avg_wait_ms']:.0f} ms" for priority, wait in stats['waits'].items()
+                          if wait['count'])
+        print(f"📢 Speech: {stats['spoken']} spoken, {stats['expired']} expired, "
+              f"{stats['deduplicated']} deduplicated, {stats['evicted'] + stats['rejected']} dropped"
+              + (f" (queue wait: {waits})" if waits else ""))
+        if self.output:
+            stats = self.output.stats()
+            self.output.close()
+            print(f"🔈 Audio output: {stats['played']} played, {stats['cancelled']} cancelled, "
+                  f"avg start {stats['avg_start_ms']:.0f} ms, {stats['clip_hits']} clip hits")
+        if self.tts_cache:
+            stats = self.tts_cache.stats()
+            print(f"💾 TTS cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} phrases")
+        if self.noise_tracker and self.noise_tracker.noise_floor is not None:
+            self.noise_tracker.save()
+            stats = self.noise_tracker.stats()
+            print(f"🎚️  Noise floor {stats['noise_floor']}, threshold {stats['energy_threshold']}, "
+                  f"SNR {stats['snr_db']} dB")
+        if self.barge_in and self.barge_in.barge_ins:
+            stats = self.barge_in.stats()
+            print(f"✋ Barge-in: {stats['barge_ins']} interruptions, reaction avg {stats['avg_reaction_ms']:.0f} ms, "
+                  f"max {stats['max_reaction_ms']:.0f} ms")
+        for stats in self.recognition_stats():
+            print(f"🗣️  {stats['backend']} recognizer: {stats['calls']} calls, "
+                  f"avg {stats['avg_ms']:.0f} ms, max {stats['max_ms']:.0f} ms, {stats['errors']} errors")
+        if self.vad_gate:
+            print(f"🔕 VAD gate saved {self.vad_gate.stats()['cloud_calls_saved']} cloud recognitions")
         print("🔇 Voice engine stopped")
 
 